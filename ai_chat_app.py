@@ -1,16 +1,31 @@
-import os
+import time
 import streamlit as st
-import openai
-from dotenv import load_dotenv
+from chat_context import ChatMemory, build_summary_request
+from llm_client import BACKGROUND, chat_completion, friendly_error, hedged_completion
 
-load_dotenv()
-API_KEY = os.getenv("API_KEY")
+# Older turns are folded into a running summary by this (fast, cheap) model
+SUMMARY_MODEL = "gpt-3.5-turbo"
 
-# Initialize OpenAI client
-client = openai.OpenAI(
-    api_key=API_KEY,
-    base_url="https://api.poe.com/v1",
-)
+def summarize_history(previous_summary, turns):
+    """Fold turns into previous_summary; runs in ChatMemory's background thread."""
+    response = chat_completion(
+        model=SUMMARY_MODEL,
+        messages=build_summary_request(previous_summary, turns),
+        stream=False,
+        priority=BACKGROUND
+    )
+    return response.choices[0].message.content
+
+def stream_tokens(stream, timing):
+    """Yield the text of each streamed chunk, recording time to first token in timing."""
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if "first_token" not in timing:
+                timing["first_token"] = time.perf_counter() - timing["start"]
+            yield delta
 
 # Page configuration
 st.set_page_config(page_title="AI Chat App", page_icon="💬", layout="wide")
@@ -55,16 +70,26 @@ with st.sidebar:
     
     # Model selection
     st.subheader("Model Selection")
+    models = ["gemini-2.5-pro", "gpt-4", "claude-3-opus", "llama-3.1-405b"]
     model = st.selectbox(
         "Choose model:",
-        ["gemini-2.5-pro", "gpt-4", "claude-3-opus", "llama-3.1-405b"],
+        models,
         index=0
     )
+    # If the chosen model is slower than usual, the same request also goes here
+    backup_options = ["None"] + [m for m in models if m != model]
+    backup_model = st.selectbox(
+        "Backup model for slow replies:",
+        backup_options,
+        index=1,
+        help="Used when the main model takes longer than its usual (p95) time to start answering"
+    )
     
     # Clear chat button
     st.divider()
     if st.button("🗑️ Clear Chat", use_container_width=True):
         st.session_state.messages = []
+        st.session_state.pop("memory", None)
         st.rerun()
 
 # Main chat interface
@@ -74,6 +99,8 @@ st.caption("Chat with an AI assistant. Customize its personality using the sideb
 # Initialize chat history
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "memory" not in st.session_state:
+    st.session_state.memory = ChatMemory(summarize_history)
 
 # Display chat messages
 for message in st.session_state.messages:
@@ -87,33 +114,31 @@ if prompt := st.chat_input("Type your message here..."):
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Prepare messages for API call
-    api_messages = []
+    # Prepare messages for API call: the system prompt, a running summary of
+    # older turns, and as much recent history as fits the model's token budget
+    api_messages = st.session_state.memory.build_messages(system_prompt, st.session_state.messages, model)
     
-    # Add system prompt if provided
-    if system_prompt and system_prompt.strip():
-        api_messages.append({"role": "system", "content": system_prompt.strip()})
-    
-    # Add conversation history
-    for msg in st.session_state.messages:
-        api_messages.append({"role": msg["role"], "content": msg["content"]})
-    
-    # Get AI response
+    # Get AI response, streamed token by token into the chat bubble
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=api_messages,
-                    stream=False
-                )
-                ai_response = response.choices[0].message.content
-                st.markdown(ai_response)
-                
-                # Add assistant response to chat history
-                st.session_state.messages.append({"role": "assistant", "content": ai_response})
-            except Exception as e:
-                error_message = f"Error: {str(e)}"
-                st.error(error_message)
-                st.session_state.messages.append({"role": "assistant", "content": error_message})
-
+        try:
+            timing = {"start": time.perf_counter()}
+            stream = hedged_completion(
+                [model] if backup_model == "None" else [model, backup_model],
+                messages=api_messages,
+                stream=True
+            )
+            ai_response = st.write_stream(stream_tokens(stream, timing))
+            total = time.perf_counter() - timing["start"]
+            if "first_token" in timing:
+                answered_by = f" · answered by backup {stream.model}" if getattr(stream, "model", model) != model else ""
+                st.caption(f"⏱️ First token in {timing['first_token']:.2f}s · full reply in {total:.2f}s{answered_by}")
+            
+            # Add assistant response to chat history
+            st.session_state.messages.append({"role": "assistant", "content": ai_response})
+            # Compact older turns in the background if the history has grown
+            st.session_state.memory.maybe_update(st.session_state.messages)
+        except Exception as e:
+            # Not added to the history, so it is never sent back to the model
+            st.error(f"⚠️ {friendly_error(e)}")
+            with st.expander("Details"):
+                st.code(str(e))
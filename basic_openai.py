@@ -10,17 +10,11 @@ Topics to cover:
 ================================================================================
 """
 
-import os
-import openai
-from dotenv import load_dotenv
+from llm_client import get_client
 
-# Setup
-load_dotenv()
-API_KEY = os.getenv("API_KEY")
-client = openai.OpenAI(
-    api_key=API_KEY,
-    base_url="https://api.poe.com/v1",
-)
+# Setup: the shared client reads API_KEY from your environment / .env file
+# (see llm_client.py for how it is built)
+client = get_client()
 
 # ============================================================================
 # 1. SIMPLE CHAT
@@ -0,0 +1,61 @@
+"""
+Benchmark request payloads of ai_chat_app over a long conversation.
+
+Compares sending the full history on every turn with fit_messages(), which
+keeps each request inside the model's token budget. No API calls are made:
+the numbers are the JSON payload size and the time to build and serialize
+each request.
+
+Usage:
+    python bench_chat_context.py             # 500 turns with gemini-2.5-pro
+    python bench_chat_context.py 1000 gpt-4
+"""
+
+import json
+import random
+import sys
+import time
+
+from chat_context import count_tokens, fit_messages
+
+SYSTEM_PROMPT = "You are an expert teacher who explains complex topics in simple, easy-to-understand ways."
+WORDS = ("python list comprehension generator streamlit session state model prompt "
+         "token budget latency cache 函數 變數 人工智慧 學習").split()
+
+
+def fake_turn(rng, role):
+    n_words = rng.randint(10, 40) if role == "user" else rng.randint(60, 250)
+    return {"role": role, "content": " ".join(rng.choice(WORDS) for _ in range(n_words))}
+
+
+def build_full(messages):
+    return [{"role": "system", "content": SYSTEM_PROMPT}] + [dict(m) for m in messages]
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    model = sys.argv[2] if len(sys.argv) > 2 else "gemini-2.5-pro"
+    rng = random.Random(0)
+    messages = []
+    print(f"{'turn':>5} {'full KB':>9} {'full ms':>8} {'fitted KB':>10} {'fitted ms':>10} {'sent turns':>11} {'tokens':>7}")
+    for turn in range(1, turns + 1):
+        messages.append(fake_turn(rng, "user"))
+
+        start = time.perf_counter()
+        full = json.dumps(build_full(messages))
+        full_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        fitted_messages = fit_messages(SYSTEM_PROMPT, messages, model)
+        fitted = json.dumps(fitted_messages)
+        fitted_ms = (time.perf_counter() - start) * 1000
+
+        if turn == 1 or turn % 50 == 0:
+            tokens = sum(count_tokens(m["content"]) for m in fitted_messages)
+            print(f"{turn:>5} {len(full) / 1024:>9.1f} {full_ms:>8.2f} {len(fitted) / 1024:>10.1f} "
+                  f"{fitted_ms:>10.2f} {len(fitted_messages) - 1:>11} {tokens:>7}")
+        messages.append(fake_turn(rng, "assistant"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark serial vs parallel cold scans of search_repo on a synthetic tree.
+
+Usage:
+    python bench_search.py            # 50,000 files
+    python bench_search.py 5000 8     # 5,000 files, 8 worker processes
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from search_utils import scan_repo
+
+WORDS = ["streamlit", "session", "state", "model", "client", "prompt", "recipe",
+         "fact", "search", "index", "python", "message", "button", "sidebar"]
+
+
+def make_tree(root, n_files, lines_per_file=40):
+    """Write n_files small text files spread over 100 sub-directories."""
+    rng = random.Random(0)
+    for i in range(n_files):
+        folder = os.path.join(root, f"dir{i % 100:03d}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"file{i:05d}.py"), "w", encoding="utf-8") as f:
+            for _ in range(lines_per_file):
+                f.write(" ".join(rng.choice(WORDS) for _ in range(8)) + "\n")
+    # one needle near the end so a full scan is needed to find it
+    with open(os.path.join(root, "dir099", "needle.md"), "w", encoding="utf-8") as f:
+        f.write("the quick brown needle\n")
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:9.1f} ms  ({len(result)} results)")
+    return result
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 2)
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Creating {n_files} files in {root} ...")
+        make_tree(root, n_files)
+        for query, max_results in (("needle", 20), ("sidebar", 50)):
+            print(f"\nquery={query!r} max_results={max_results}")
+            serial = timed("serial", lambda: scan_repo(query, root, max_results))
+            parallel = timed(f"parallel ({workers} workers)",
+                             lambda: scan_repo(query, root, max_results, workers=workers))
+            assert serial == parallel, "parallel scan must return the same results in the same order"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark serial vs batched Wikipedia lookups against a local mock server.
+
+The mock answers the search and summary endpoints after a fixed delay, so
+no real network traffic is made.
+
+Usage:
+    python bench_wiki.py              # 200 topics, 50 ms per request
+    python bench_wiki.py 500 0.1 16   # 500 topics, 100 ms per request, 16 in flight
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from wiki_client import WikiClient
+
+
+class MockWikipedia(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    delay = 0.05
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        url = urllib.parse.urlparse(self.path)
+        if url.path == "/w/api.php":
+            query = urllib.parse.parse_qs(url.query)["srsearch"][0]
+            # two topics in ten map onto a shared title to exercise title dedup
+            title = "Shared Topic" if query.endswith(("3", "7")) else query.title()
+            body = {"query": {"search": [{"title": title}]}}
+        else:
+            title = urllib.parse.unquote(url.path.rsplit("/", 1)[1])
+            body = {"extract": f"Summary of {title}."}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_client(base_url, concurrency):
+    return WikiClient(cache_path=None, pool_size=concurrency,
+                      api_url=f"{base_url}/w/api.php", rest_url=f"{base_url}/api/rest_v1")
+
+
+def main():
+    n_topics = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    MockWikipedia.delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockWikipedia)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    # every tenth query repeats an earlier one
+    queries = [f"topic {i if i % 10 else 0}" for i in range(n_topics)]
+
+    try:
+        client = make_client(base_url, concurrency)
+        start = time.perf_counter()
+        serial = [client.search_summary(q) for q in queries]
+        print(f"serial:  {time.perf_counter() - start:7.2f} s for {n_topics} topics")
+
+        client = make_client(base_url, concurrency)
+        start = time.perf_counter()
+        batched = asyncio.run(client.search_summaries_async(queries, concurrency=concurrency))
+        print(f"batched: {time.perf_counter() - start:7.2f} s for {n_topics} topics "
+              f"(concurrency={concurrency})")
+        assert serial == batched, "batched lookups must match serial lookups in input order"
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to an estimate
+    _ENCODING = None
+
+# Tokens of conversation history (system prompt included) sent per request.
+# Well below each model's real context window so requests stay small and fast.
+MODEL_BUDGETS = {
+    "gemini-2.5-pro": 16000,
+    "gpt-4": 6000,
+    "claude-3-opus": 16000,
+    "llama-3.1-405b": 12000,
+}
+DEFAULT_BUDGET = 6000
+# Per-message overhead for role and separators in the chat format
+MESSAGE_OVERHEAD = 4
+# Don't bother keeping a truncated older turn with less room than this
+MIN_TRUNCATED_TOKENS = 64
+
+
+def _count(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    # roughly 4 characters per token for ASCII, about one token per CJK character
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+@lru_cache(maxsize=16384)
+def count_tokens(text: str) -> int:
+    """Count (or, without tiktoken, estimate) the tokens in text. Cached per string."""
+    return _count(text)
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_end: bool = True) -> str:
+    """Shorten text to about max_tokens, keeping its end (or start) and marking the cut."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    lo, hi = 0, len(text)
+    # binary search for the longest slice that fits
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        piece = text[len(text) - mid:] if keep_end else text[:mid]
+        if _count(piece) + 1 <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return "…" + text[len(text) - lo:] if keep_end else text[:lo] + "…"
+
+
+def fit_messages(system_prompt: str, messages: List[Dict[str, str]], model: str,
+                 budget: Optional[int] = None) -> List[Dict[str, str]]:
+    """Build the API message list for one request within the model's token budget.
+
+    The system prompt and the latest message are always sent (the latest one
+    truncated if it alone is over budget). Older turns are added newest
+    first until the budget is spent; the turn that no longer fits is
+    truncated to the remaining room, and anything older is dropped. Each
+    call only looks at the turns it keeps, so its cost does not grow with
+    the length of the conversation.
+    """
+    budget = budget or MODEL_BUDGETS.get(model, DEFAULT_BUDGET)
+    head: List[Dict[str, str]] = []
+    if system_prompt and system_prompt.strip():
+        head.append({"role": "system", "content": system_prompt.strip()})
+    if not messages:
+        return head
+    remaining = budget - sum(message_tokens(m) for m in head)
+
+    latest = messages[-1]
+    if message_tokens(latest) > remaining:
+        content = truncate_to_tokens(latest["content"], max(remaining - MESSAGE_OVERHEAD, 1), keep_end=False)
+        return head + [{"role": latest["role"], "content": content}]
+    remaining -= message_tokens(latest)
+
+    kept: List[Dict[str, str]] = [{"role": latest["role"], "content": latest["content"]}]
+    for message in reversed(messages[:-1]):
+        cost = message_tokens(message)
+        if cost <= remaining:
+            kept.append({"role": message["role"], "content": message["content"]})
+            remaining -= cost
+            continue
+        if remaining - MESSAGE_OVERHEAD >= MIN_TRUNCATED_TOKENS:
+            content = truncate_to_tokens(message["content"], remaining - MESSAGE_OVERHEAD)
+            kept.append({"role": message["role"], "content": content})
+        break
+    return head + kept[::-1]
+
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Update the summary with the new turns below. Keep names, facts, decisions, the user's "
+    "preferences and any open questions; drop small talk. Write at most 200 words and reply "
+    "with the updated summary only."
+)
+
+
+def build_summary_request(previous_summary: str, turns: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Messages asking a model to fold turns into previous_summary."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in turns)
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": f"Current summary:\n{previous_summary or '(none yet)'}\n\nNew turns:\n{transcript}"},
+    ]
+
+
+class ChatMemory:
+    """Rolling summary of the older part of a conversation.
+
+    Once the turns not yet summarized (apart from the keep_recent newest)
+    exceed threshold_tokens, a background thread folds just those turns into
+    the existing summary with summarize(previous_summary, turns). Requests
+    then carry the summary plus the turns after it, so nothing ever waits
+    for summarization: until a new summary is ready the previous one (and
+    the token budget in fit_messages) is used.
+    """
+
+    def __init__(self, summarize: Callable[[str, List[Dict[str, str]]], str],
+                 threshold_tokens: int = 3000, keep_recent: int = 6, max_summary_tokens: int = 600):
+        self.summarize = summarize
+        self.threshold_tokens = threshold_tokens
+        self.keep_recent = keep_recent
+        self.max_summary_tokens = max_summary_tokens
+        self.summary = ""
+        self.summarized_upto = 0  # number of leading messages folded into the summary
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.summary = ""
+            self.summarized_upto = 0
+
+    def maybe_update(self, messages: List[Dict[str, str]]) -> bool:
+        """Start a background summary update if enough new history has built up.
+        Returns True if an update was started."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return False
+            if self.summarized_upto > len(messages):  # the chat was cleared
+                self.summary, self.summarized_upto = "", 0
+            cut = len(messages) - self.keep_recent
+            pending = messages[self.summarized_upto:cut]
+            if not pending or sum(message_tokens(m) for m in pending) < self.threshold_tokens:
+                return False
+            turns = [{"role": m["role"], "content": m["content"]} for m in pending]
+            self._worker = threading.Thread(
+                target=self._update, args=(self.summary, turns, self.summarized_upto, cut), daemon=True
+            )
+            self._worker.start()
+            return True
+
+    def _update(self, previous: str, turns: List[Dict[str, str]], start: int, cut: int) -> None:
+        try:
+            summary = self.summarize(previous, turns).strip()
+        except Exception:
+            return  # keep the old summary; the next turn will try again
+        summary = truncate_to_tokens(summary, self.max_summary_tokens, keep_end=False)
+        with self._lock:
+            # ignore the result if the chat was reset while we were working
+            if self.summarized_upto == start and self.summary == previous:
+                self.summary, self.summarized_upto = summary, cut
+
+    def build_messages(self, system_prompt: str, messages: List[Dict[str, str]], model: str,
+                       budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """API messages for the next request: system prompt, summary, then unsummarized turns."""
+        with self._lock:
+            summary, upto = self.summary, self.summarized_upto
+        if upto > len(messages):
+            summary, upto = "", 0
+        system = (system_prompt or "").strip()
+        if summary:
+            system = f"{system}\n\nSummary of the earlier conversation:\n{summary}".strip()
+        return fit_messages(system, messages[upto:], model, budget=budget)
@@ -0,0 +1,86 @@
+"""
+Check that every local search path returns what the original line-by-line
+search did.
+
+Builds a small tree of awkward files (CRLF and bare-CR line endings,
+Unicode characters that case-fold to ASCII letters, Greek final sigma,
+invalid UTF-8 bytes, empty files) and compares, for a set of queries, the
+original algorithm against scan_repo (serial and process pool), the mmap
+fast path and the on-disk index.
+
+Usage:
+    python check_search.py
+"""
+
+import os
+import re
+import sys
+import tempfile
+
+from search_utils import scan_repo, search_repo
+
+FILES = {
+    "plain.py": b"def hello():\n    return 'Hello World'\n# HELLO again\n",
+    "crlf.md": b"first line\r\nhello from windows\r\nlast HELLO\r\n",
+    "bare_cr.txt": b"old mac\rhello after bare cr\rmore\nhello on line four\n",
+    "folds.txt": "Kelvin kit\nsun and ſun\nİtem and ıtem\nlist it\n".encode("utf-8"),
+    "invalid.txt": b"a\xffb split by an invalid byte\nab plain\nmixed caf\xc3\xa9 hello\n",
+    "cjk.md": "人工智慧 hello 世界\n第二行 list comprehension\n".encode("utf-8"),
+    "greek.txt": "ΟΔΟΣ big\nη οδος μικρη\nΣΟΦΙΑ\n".encode("utf-8"),
+    "empty.py": b"",
+    "sub/deep.rst": b"nested hello\nkit\n" * 3,
+    "sub/no_newline.py": b"hello at eof",
+}
+QUERIES = ["hello", "HELLO", "kit", "sun", "item", "it", "ab", "list comp", "café", "人工",
+           "οδοσ", "ΟΔΟΣ", "οδος", "σοφια", "o w", "zzz"]
+
+
+def baseline_search(query, root, max_results):
+    """The search_repo implementation before the index and fast paths existed."""
+    results = []
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
+    for dirpath, _, filenames in os.walk(root):
+        if any(part in (".git", "venv", "node_modules") for part in dirpath.split(os.sep)):
+            continue
+        for fn in filenames:
+            if fn.endswith(('.py', '.md', '.txt', '.rst')):
+                path = os.path.join(dirpath, fn)
+                try:
+                    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                        for i, line in enumerate(f, start=1):
+                            if pattern.search(line):
+                                results.append((os.path.relpath(path, start=root), i, line.strip()))
+                                if len(results) >= max_results:
+                                    return results
+                except Exception:
+                    continue
+    return results
+
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as root:
+        for rel, data in FILES.items():
+            path = os.path.join(root, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        for query in QUERIES:
+            for max_results in (2, 50):
+                expected = baseline_search(query, root, max_results)
+                candidates = {
+                    "scan": scan_repo(query, root, max_results),
+                    "scan (2 workers)": scan_repo(query, root, max_results, workers=2, chunk_size=2),
+                    "index": search_repo(query, root, max_results),
+                }
+                for name, got in candidates.items():
+                    if got != expected:
+                        failures += 1
+                        print(f"MISMATCH {name} query={query!r} max_results={max_results}\n"
+                              f"  expected {expected}\n  got      {got}")
+    print("all search paths agree" if not failures else f"{failures} mismatches")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Check WikiClient's connection reuse, caching and lookup statuses against
+the local mock server from bench_wiki.py, without any real network traffic.
+
+Covers keep-alive reuse of one pooled connection, the SQLite cache surviving
+a restart, TTL expiry, stale-while-revalidate, LRU eviction, and the
+hit / miss / error statuses of lookup() with misses cached for negative_ttl
+and errors not cached at all.
+
+Usage:
+    python check_wiki.py
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import ThreadingHTTPServer
+
+from bench_wiki import MockWikipedia
+from wiki_client import WikiClient, WikiResult
+
+# the mock maps topics ending in 3 or 7 onto one shared title; avoid them here
+TOPICS = (0, 1, 2, 4, 5)
+
+
+class CheckWikipedia(MockWikipedia):
+    """The benchmark mock, recording requests and connections. Searches for
+    "nothing ..." find no page and searches for "broken ..." fail with 500."""
+    delay = 0.0
+    requests = []
+    connections = set()
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        self.connections.add(self.client_address)
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query).get("srsearch", [""])[0]
+        if query.startswith("nothing"):
+            self._reply(200, {"query": {"search": []}})
+        elif query.startswith("broken"):
+            self._reply(500, {"error": "unavailable"})
+        else:
+            super().do_GET()
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def requests_made(func):
+    """Run func() and return (its result, number of HTTP requests it made)."""
+    before = len(CheckWikipedia.requests)
+    result = func()
+    return result, len(CheckWikipedia.requests) - before
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CheckWikipedia)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = {"api_url": f"{base_url}/w/api.php", "rest_url": f"{base_url}/api/rest_v1"}
+    cache_dir = tempfile.mkdtemp()
+    cache_path = os.path.join(cache_dir, "wiki_cache.sqlite3")
+
+    try:
+        # connection reuse: serial lookups share one keep-alive connection
+        client = WikiClient(cache_path=cache_path, **urls)
+        CheckWikipedia.connections.clear()
+        for i in TOPICS:
+            assert client.search_summary(f"topic {i}") == (f"Topic {i}", f"Summary of Topic {i}.")
+        assert len(CheckWikipedia.connections) == 1, CheckWikipedia.connections
+
+        # cache hits, including case and spacing variants of a query
+        result, n = requests_made(lambda: client.search_summary("  TOPIC   4 "))
+        assert (result, n) == (("Topic 4", "Summary of Topic 4."), 0), (result, n)
+        client.close()
+
+        # warm restart: a new client on the same file answers without the network
+        client = WikiClient(cache_path=cache_path, **urls)
+        results, n = requests_made(lambda: [client.search_summary(f"topic {i}") for i in TOPICS])
+        assert n == 0 and results[-1] == ("Topic 5", "Summary of Topic 5."), (results, n)
+        client.close()
+
+        # TTL expiry: without a stale window an expired entry is fetched again
+        client = WikiClient(cache_path=None, ttl=0.2, stale_ttl=0, **urls)
+        client.search_summary("topic 1")
+        time.sleep(0.3)
+        _, n = requests_made(lambda: client.search_summary("topic 1"))
+        assert n == 2, n
+
+        # stale-while-revalidate: the expired value is served at once and refreshed behind it
+        client = WikiClient(cache_path=None, ttl=0.2, stale_ttl=60, **urls)
+        client.search_summary("topic 2")
+        time.sleep(0.3)
+        CheckWikipedia.delay = 0.5  # the refresh must not hold up the answer
+        start = time.perf_counter()
+        result = client.search_summary("topic 2")
+        assert result == ("Topic 2", "Summary of Topic 2.") and time.perf_counter() - start < 0.25, result
+        deadline = time.time() + 5
+        def refreshed():
+            return client.titles.get_entry("topic 2").fresh and client.summaries.get_entry("Topic 2").fresh
+        while time.time() < deadline and not refreshed():
+            time.sleep(0.01)
+        assert refreshed()
+        CheckWikipedia.delay = 0.0
+
+        # LRU eviction: the least recently used title is the one dropped
+        client = WikiClient(cache_path=None, maxsize=2, **urls)
+        for query in ("topic 5", "topic 6", "topic 5", "topic 8"):
+            client.search_title(query)
+        _, n = requests_made(lambda: client.search_title("topic 5"))
+        assert n == 0, n
+        _, n = requests_made(lambda: client.search_title("topic 6"))
+        assert n == 1, n
+
+        # lookup statuses; misses are cached for negative_ttl, errors never
+        client = WikiClient(cache_path=None, negative_ttl=0.2, stale_ttl=0, **urls)
+        assert client.lookup("topic 9") == WikiResult("Topic 9", "Summary of Topic 9.", "hit")
+        result, n = requests_made(lambda: client.lookup("nothing here"))
+        assert (result, n) == (WikiResult("", "", "miss"), 1), (result, n)
+        result, n = requests_made(lambda: client.lookup("nothing here"))
+        assert (result, n) == (WikiResult("", "", "miss"), 0), (result, n)
+        time.sleep(0.3)
+        _, n = requests_made(lambda: client.lookup("nothing here"))
+        assert n == 1, n
+        for _ in range(2):
+            result, n = requests_made(lambda: client.lookup("broken page"))
+            assert (result, n) == (WikiResult("", "", "error"), 1), (result, n)
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    print("wiki client checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
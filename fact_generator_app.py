@@ -1,17 +1,8 @@
-import os
 import streamlit as st
-import openai
-from dotenv import load_dotenv
 from datetime import datetime
-
-load_dotenv()
-API_KEY = os.getenv("API_KEY")
-
-# Initialize OpenAI client
-client = openai.OpenAI(
-    api_key=API_KEY,
-    base_url="https://api.poe.com/v1",
-)
+from fact_index import get_fact_index
+from facts import FactPool, fact_key, generate_facts, generate_unique_facts, record_shown
+from llm_client import cache_stats
 
 # Page configuration
 st.set_page_config(
@@ -62,6 +53,13 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner=False)
+def get_fact_pool():
+    """Process-wide pool of pre-generated facts, shared by all sessions."""
+    return FactPool(max_refills=2, index=get_fact_index())
+
+fact_pool = get_fact_pool()
+
 # Initialize session state
 if "facts" not in st.session_state:
     st.session_state.facts = []
@@ -99,15 +97,34 @@ with st.sidebar:
         index=0
     )
     
+    # Background prefetch: keep this many facts ready so a click is instant
+    prefetch_depth = st.slider("Facts kept ready", min_value=0, max_value=10, value=3)
+    
+    # Several facts per click are generated in a single request
+    facts_per_click = st.slider("Facts per click", min_value=1, max_value=5, value=1)
+    
+    # Response cache: same category + model may return a previously generated fact
+    reuse_cached = st.checkbox(
+        "♻️ Reuse cached facts",
+        value=False,
+        help="Answer repeated requests from the local cache instead of calling the model again"
+    )
+    
     # Clear facts button
     st.divider()
     if st.button("🗑️ Clear All Facts", use_container_width=True):
         st.session_state.facts = []
+        st.session_state.card_html = {}
         st.rerun()
     
     # Stats
     st.divider()
     st.metric("Total Facts", len(st.session_state.facts))
+    st.caption(f"Ready to show instantly: {fact_pool.size(category, model)}")
+    st.caption(f"Distinct facts remembered: {len(get_fact_index())}")
+    stats = cache_stats()
+    st.caption(f"Response cache: {stats['hits']} hits / {stats['misses']} misses · "
+               f"{stats['coalesced']} requests shared with other users")
 
 # Main content area
 col1, col2 = st.columns([3, 1])
@@ -115,98 +132,107 @@ col1, col2 = st.columns([3, 1])
 with col1:
     # Generate fact button
     if st.button("✨ Generate New Fact", use_container_width=True, type="primary"):
-        with st.spinner("Generating an interesting fact..."):
-            try:
-                # Create prompt based on category
-                if category == "Random":
-                    prompt = "Generate a fascinating, true, and interesting random fact. Make it concise (1-2 sentences) and engaging. Provide the fact in BOTH English and Traditional Chinese. Format your response as:\n\nEnglish: [fact in English]\nTraditional Chinese: [fact in Traditional Chinese]"
-                else:
-                    prompt = f"Generate a fascinating, true, and interesting fact about {category.lower()}. Make it concise (1-2 sentences) and engaging. Provide the fact in BOTH English and Traditional Chinese. Format your response as:\n\nEnglish: [fact in English]\nTraditional Chinese: [fact in Traditional Chinese]"
-                
-                # Get AI response
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a knowledgeable fact generator. Provide interesting, accurate, and engaging facts in both English and Traditional Chinese. Keep responses concise and factual. Always format your response with 'English:' and 'Traditional Chinese:' labels."
-                        },
-                        {"role": "user", "content": prompt}
-                    ],
-                    stream=False
-                )
-                
-                response_text = response.choices[0].message.content.strip()
-                
-                # Parse English and Traditional Chinese from response
-                fact_text_en = ""
-                fact_text_zh_tw = ""
-                
-                if "English:" in response_text and "Traditional Chinese:" in response_text:
-                    parts = response_text.split("Traditional Chinese:")
-                    if len(parts) == 2:
-                        fact_text_en = parts[0].replace("English:", "").strip()
-                        fact_text_zh_tw = parts[1].strip()
-                elif "English:" in response_text:
-                    fact_text_en = response_text.replace("English:", "").strip()
-                elif "Traditional Chinese:" in response_text:
-                    fact_text_zh_tw = response_text.replace("Traditional Chinese:", "").strip()
-                else:
-                    # Fallback: treat entire response as English
-                    fact_text_en = response_text
-                
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Add fact to session state
+        try:
+            shown = {fact_key(f) for f in st.session_state.facts}
+            # Take pre-generated facts from the pool when they are ready
+            new_facts = [] if reuse_cached else fact_pool.take(
+                category, model, facts_per_click, exclude=shown, depth=prefetch_depth
+            )
+            # Facts are remembered as seen once shown; drop any shown elsewhere meanwhile
+            if not reuse_cached:
+                new_facts = record_shown(get_fact_index(), new_facts)
+            missing = facts_per_click - len(new_facts)
+            if missing:
+                with st.spinner("Generating an interesting fact..." if missing == 1 else f"Generating {missing} interesting facts..."):
+                    if reuse_cached:
+                        new_facts += generate_facts(category, model, missing, cache=True)
+                    else:
+                        # near-duplicates of earlier facts are re-requested; facts other
+                        # sessions record while this request is shared with them still count
+                        since = get_fact_index().last_id()
+                        generated = generate_unique_facts(category, model, missing, get_fact_index(), since=since)
+                        new_facts += record_shown(get_fact_index(), generated, since=since)
+            if not new_facts:
+                raise RuntimeError("the model kept repeating facts we already have, please try another category")
+            
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            
+            # Add facts to session state
+            for fact in new_facts:
                 st.session_state.facts.append({
-                    "text_en": fact_text_en,
-                    "text_zh_tw": fact_text_zh_tw,
+                    "text_en": fact["text_en"],
+                    "text_zh_tw": fact["text_zh_tw"],
                     "category": category,
                     "timestamp": timestamp
                 })
-                
-                st.success("Fact generated successfully! ✨")
-                st.rerun()
-                
-            except Exception as e:
-                st.error(f"Error generating fact: {str(e)}")
+            
+            st.session_state.pop("fact_page", None)  # back to the newest cards
+            st.success("Fact generated successfully! ✨" if len(new_facts) == 1 else f"{len(new_facts)} facts generated successfully! ✨")
+            st.rerun()
+            
+        except Exception as e:
+            st.error(f"Error generating fact: {str(e)}")
 
 with col2:
     st.write("")  # Spacing
 
 # Display facts in cards
+CARDS_PER_PAGE = 10
+
+
+def card_html(number, fact):
+    """HTML for one fact card, built once per fact and kept in session state."""
+    key = (number, fact['timestamp'], fact.get('text_en', fact.get('text', '')))
+    cached = st.session_state.card_html.get(key)
+    if cached is not None:
+        return cached
+    # Handle both old format (text) and new format (text_en, text_zh_tw)
+    fact_en = fact.get('text_en', fact.get('text', ''))
+    fact_zh_tw = fact.get('text_zh_tw', '')
+    
+    # Create card using markdown with custom styling
+    if fact_zh_tw:
+        html = f"""
+        <div class="fact-card">
+            <h3>💡 {fact['category']} Fact #{number}</h3>
+            <div class="fact-content">
+                <strong>🇬🇧 English:</strong><br>{fact_en}<br><br>
+                <strong>🇹🇼 繁體中文:</strong><br>{fact_zh_tw}
+            </div>
+            <div class="fact-timestamp">🕒 {fact['timestamp']}</div>
+        </div>
+        """
+    else:
+        # Fallback for old format facts
+        html = f"""
+        <div class="fact-card">
+            <h3>💡 {fact['category']} Fact #{number}</h3>
+            <div class="fact-content">{fact_en}</div>
+            <div class="fact-timestamp">🕒 {fact['timestamp']}</div>
+        </div>
+        """
+    st.session_state.card_html[key] = html
+    return html
+
+
+if "card_html" not in st.session_state:
+    st.session_state.card_html = {}
+
 if st.session_state.facts:
     st.divider()
-    st.subheader(f"📚 Your Fact Collection ({len(st.session_state.facts)} facts)")
+    total = len(st.session_state.facts)
+    st.subheader(f"📚 Your Fact Collection ({total} facts)")
     
-    # Display facts in reverse order (newest first)
-    for idx, fact in enumerate(reversed(st.session_state.facts)):
-        # Handle both old format (text) and new format (text_en, text_zh_tw)
-        fact_en = fact.get('text_en', fact.get('text', ''))
-        fact_zh_tw = fact.get('text_zh_tw', '')
-        
-        # Create card using markdown with custom styling
-        if fact_zh_tw:
-            card_html = f"""
-            <div class="fact-card">
-                <h3>💡 {fact['category']} Fact #{len(st.session_state.facts) - idx}</h3>
-                <div class="fact-content">
-                    <strong>🇬🇧 English:</strong><br>{fact_en}<br><br>
-                    <strong>🇹🇼 繁體中文:</strong><br>{fact_zh_tw}
-                </div>
-                <div class="fact-timestamp">🕒 {fact['timestamp']}</div>
-            </div>
-            """
-        else:
-            # Fallback for old format facts
-            card_html = f"""
-            <div class="fact-card">
-                <h3>💡 {fact['category']} Fact #{len(st.session_state.facts) - idx}</h3>
-                <div class="fact-content">{fact_en}</div>
-                <div class="fact-timestamp">🕒 {fact['timestamp']}</div>
-            </div>
-            """
-        st.markdown(card_html, unsafe_allow_html=True)
+    # Only the current page of cards is rendered, newest first
+    pages = (total + CARDS_PER_PAGE - 1) // CARDS_PER_PAGE
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="fact_page")
+    newest = total - (page - 1) * CARDS_PER_PAGE
+    oldest = max(newest - CARDS_PER_PAGE, 0)
+    cards = [card_html(number, st.session_state.facts[number - 1])
+             for number in range(newest, oldest, -1)]
+    st.markdown("".join(cards), unsafe_allow_html=True)
 else:
     st.info("👆 Click the button above to generate your first fact!")
 
@@ -0,0 +1,161 @@
+"""
+Near-duplicate index for generated facts.
+
+Each fact's normalized English text is reduced to a MinHash signature
+(num_perm minimum hashes over its content words). Signatures are split into
+bands, and two facts land in the same bucket of some band with high
+probability when their word sets are similar, so a lookup only compares
+against the handful of facts sharing a bucket instead of every fact seen.
+Signatures and buckets are kept in SQLite, so the index survives restarts
+and is shared by every session.
+"""
+
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from typing import FrozenSet, List, Optional
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fact_index.sqlite3")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have in is it its of on or that the their "
+    "there they this to was were which with".split()
+)
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+
+
+def shingles(text: str) -> FrozenSet[str]:
+    """Content words of text, lowercased; falls back to character bigrams for
+    text without any (e.g. a fact that only came back in Chinese)."""
+    words = frozenset(w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS)
+    if words:
+        return words
+    chars = "".join(text.split())
+    return frozenset(chars[i:i + 2] for i in range(max(len(chars) - 1, 1)) if chars)
+
+
+def _hash64(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class FactIndex:
+    """Persistent MinHash/LSH index answering "have we already seen this fact?".
+
+    Two facts count as duplicates when the estimated Jaccard similarity of
+    their content words is at least threshold. With the default 16 bands
+    of 4 rows, pairs above about 0.5 similarity are almost always found.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_INDEX_PATH, threshold: float = 0.5,
+                 num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self._rows = num_perm // bands
+        rng = random.Random(1)  # fixed seed: stored signatures must stay comparable
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS facts ("
+                " id INTEGER PRIMARY KEY, text TEXT NOT NULL, signature BLOB NOT NULL, added_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " band INTEGER NOT NULL, hash INTEGER NOT NULL, fact_id INTEGER NOT NULL,"
+                " PRIMARY KEY (band, hash, fact_id)) WITHOUT ROWID"
+            )
+
+    def signature(self, text: str) -> List[int]:
+        hashes = [_hash64(s) for s in shingles(text)]
+        if not hashes:
+            return [_MAX_HASH] * self.num_perm
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_hashes(self, signature: List[int]) -> List[int]:
+        result = []
+        for band in range(self.bands):
+            rows = array("Q", signature[band * self._rows:(band + 1) * self._rows]).tobytes()
+            digest = hashlib.blake2b(rows, digest_size=8).digest()
+            result.append(int.from_bytes(digest, "little", signed=True))  # fits SQLite INTEGER
+        return result
+
+    def _similarity(self, a: List[int], b: List[int]) -> float:
+        return sum(x == y for x, y in zip(a, b)) / self.num_perm
+
+    def _find(self, signature: List[int], band_hashes: List[int], up_to: Optional[int] = None) -> Optional[str]:
+        placeholders = " OR ".join(["(band = ? AND hash = ?)"] * self.bands)
+        params = [v for pair in enumerate(band_hashes) for v in pair]
+        if up_to is not None:
+            placeholders = f"({placeholders}) AND fact_id <= ?"
+            params.append(up_to)
+        rows = self._conn.execute(
+            f"SELECT text, signature FROM facts WHERE id IN"
+            f" (SELECT fact_id FROM buckets WHERE {placeholders})",
+            params,
+        ).fetchall()
+        for text, blob in rows:
+            if self._similarity(signature, array("Q", blob).tolist()) >= self.threshold:
+                return text
+        return None
+
+    def find_duplicate(self, text: str, up_to: Optional[int] = None) -> Optional[str]:
+        """Return the stored text of a near-duplicate of text, or None.
+        With up_to (a last_id() value), facts added after it are ignored."""
+        signature = self.signature(text)
+        with self._lock:
+            return self._find(signature, self._band_hashes(signature), up_to)
+
+    def last_id(self) -> int:
+        """Id of the most recently added fact (0 if none); a snapshot for find_duplicate()."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM facts").fetchone()[0]
+
+    def add(self, text: str) -> bool:
+        """Record text unless it is a near-duplicate of a stored fact.
+        Returns True if it was new and has been added."""
+        signature = self.signature(text)
+        band_hashes = self._band_hashes(signature)
+        with self._lock:
+            if self._find(signature, band_hashes) is not None:
+                return False
+            with self._conn:
+                fact_id = self._conn.execute(
+                    "INSERT INTO facts (text, signature, added_at) VALUES (?, ?, ?)",
+                    (text, array("Q", signature).tobytes(), time.time()),
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)",
+                    [(band, h, fact_id) for band, h in enumerate(band_hashes)],
+                )
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+
+
+_index: Optional[FactIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_fact_index() -> FactIndex:
+    """Return the shared on-disk index (in memory only if the file can't be opened)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = FactIndex()
+            except sqlite3.Error:
+                _index = FactIndex(path=None)
+        return _index
@@ -0,0 +1,263 @@
+import functools
+import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Collection, Deque, Dict, List, Optional, Tuple
+
+from fact_index import FactIndex
+from llm_client import BACKGROUND, INTERACTIVE, chat_completion
+
+SYSTEM_PROMPT = "You are a knowledgeable fact generator. Provide interesting, accurate, and engaging facts in both English and Traditional Chinese. Keep responses concise and factual. Always format your response with 'English:' and 'Traditional Chinese:' labels."
+
+
+def build_prompt(category: str) -> str:
+    """User prompt asking for one bilingual fact in the given category."""
+    if category == "Random":
+        return "Generate a fascinating, true, and interesting random fact. Make it concise (1-2 sentences) and engaging. Provide the fact in BOTH English and Traditional Chinese. Format your response as:\n\nEnglish: [fact in English]\nTraditional Chinese: [fact in Traditional Chinese]"
+    return f"Generate a fascinating, true, and interesting fact about {category.lower()}. Make it concise (1-2 sentences) and engaging. Provide the fact in BOTH English and Traditional Chinese. Format your response as:\n\nEnglish: [fact in English]\nTraditional Chinese: [fact in Traditional Chinese]"
+
+
+def parse_fact(response_text: str) -> Tuple[str, str]:
+    """Split a model reply into (english, traditional_chinese)."""
+    fact_text_en = ""
+    fact_text_zh_tw = ""
+
+    if "English:" in response_text and "Traditional Chinese:" in response_text:
+        parts = response_text.split("Traditional Chinese:")
+        if len(parts) == 2:
+            fact_text_en = parts[0].replace("English:", "").strip()
+            fact_text_zh_tw = parts[1].strip()
+    elif "English:" in response_text:
+        fact_text_en = response_text.replace("English:", "").strip()
+    elif "Traditional Chinese:" in response_text:
+        fact_text_zh_tw = response_text.replace("Traditional Chinese:", "").strip()
+    else:
+        # Fallback: treat entire response as English
+        fact_text_en = response_text
+    return fact_text_en, fact_text_zh_tw
+
+
+def generate_fact(category: str, model: str, cache: bool = False, coalesce: bool = True,
+                  priority: int = INTERACTIVE) -> Dict[str, str]:
+    """Ask the model for one fact; returns {"text_en", "text_zh_tw", "category"}."""
+    response = chat_completion(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_prompt(category)}
+        ],
+        stream=False,
+        cache=cache,
+        coalesce=coalesce,
+        priority=priority
+    )
+    fact_text_en, fact_text_zh_tw = parse_fact(response.choices[0].message.content.strip())
+    return {"text_en": fact_text_en, "text_zh_tw": fact_text_zh_tw, "category": category}
+
+
+BATCH_SYSTEM_PROMPT = "You are a knowledgeable fact generator. Provide interesting, accurate, and engaging facts in both English and Traditional Chinese. Keep each fact concise and factual. Reply with JSON only, no commentary."
+
+
+def build_batch_prompt(category: str, n: int) -> str:
+    """User prompt asking for n distinct bilingual facts as JSON."""
+    topic = "random topics" if category == "Random" else category.lower()
+    return (
+        f"Generate {n} different fascinating, true, and interesting facts about {topic}. "
+        "Make each one concise (1-2 sentences) and engaging, and give it in BOTH English and Traditional Chinese. "
+        'Respond with a JSON object of the form {"facts": [{"english": "...", "traditional_chinese": "..."}, ...]} '
+        f"containing exactly {n} items."
+    )
+
+
+def parse_fact_batch(response_text: str, category: str) -> List[Dict[str, str]]:
+    """Return the well-formed facts in a JSON batch reply; malformed items are skipped."""
+    text = response_text.strip()
+    # tolerate a ```json fenced block or text around the JSON
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    end = max(text.rfind("}"), text.rfind("]"))
+    if start < 0 or end < start:
+        return []
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return []
+    items = data.get("facts", []) if isinstance(data, dict) else data
+    facts = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        en, zh = item.get("english"), item.get("traditional_chinese")
+        if isinstance(en, str) and isinstance(zh, str) and en.strip() and zh.strip():
+            facts.append({"text_en": en.strip(), "text_zh_tw": zh.strip(), "category": category})
+    return facts
+
+
+def generate_facts(category: str, model: str, n: int, cache: bool = False,
+                   coalesce: bool = True, priority: int = INTERACTIVE) -> List[Dict[str, str]]:
+    """Ask for n facts in one JSON completion.
+
+    Items that are malformed, missing or repeated within the batch are
+    replaced one at a time with generate_fact() instead of asking for the
+    whole batch again. Returns up to n facts (fewer only if those single
+    requests fail). coalesce applies to every request, including n == 1,
+    which is a single generate_fact() call.
+    """
+    facts: List[Dict[str, str]] = []
+    if n > 1:
+        response = chat_completion(
+            model=model,
+            messages=[
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": build_batch_prompt(category, n)}
+            ],
+            stream=False,
+            cache=cache,
+            coalesce=coalesce,
+            priority=priority
+        )
+        seen = set()
+        for fact in parse_fact_batch(response.choices[0].message.content, category):
+            if fact_key(fact) not in seen:
+                seen.add(fact_key(fact))
+                facts.append(fact)
+        facts = facts[:n]
+    for _ in range(n - len(facts)):
+        try:
+            facts.append(generate_fact(category, model, cache=cache, coalesce=coalesce, priority=priority))
+        except Exception:
+            if not facts:
+                raise
+    return facts
+
+
+def fact_key(fact: Dict[str, str]) -> str:
+    """Normalized text used to tell whether two facts are the same."""
+    return " ".join((fact.get("text_en") or fact.get("text_zh_tw") or "").lower().split())
+
+
+def _index_text(fact: Dict[str, str]) -> str:
+    return fact["text_en"] or fact["text_zh_tw"]
+
+
+def generate_unique_facts(category: str, model: str, n: int, index: FactIndex, attempts: int = 3,
+                          since: Optional[int] = None, **kwargs) -> List[Dict[str, str]]:
+    """Like generate_facts(), but facts that are near-duplicates of ones in
+    index, or of each other, are dropped and the shortfall is requested
+    again, up to attempts rounds.
+
+    Only facts in the index as of since (index.last_id() when the call
+    starts if None) count as seen. A coalesced request hands the same facts
+    to every session waiting on it, and the first of them to record the
+    facts must not make them repeats for the others.
+
+    The index is only read here; facts are recorded with record_shown()
+    once they are actually displayed, so prefetched facts that are never
+    shown don't block anything.
+    """
+    if since is None:
+        since = index.last_id()
+    batch = FactIndex(path=None, threshold=index.threshold)  # catches repeats within this call
+    facts: List[Dict[str, str]] = []
+    for _ in range(attempts):
+        if len(facts) >= n:
+            break
+        for fact in generate_facts(category, model, n - len(facts), **kwargs):
+            if index.find_duplicate(_index_text(fact), up_to=since) is None and batch.add(_index_text(fact)):
+                facts.append(fact)
+    return facts
+
+
+def record_shown(index: FactIndex, facts: List[Dict[str, str]], since: Optional[int] = None) -> List[Dict[str, str]]:
+    """Add facts that are about to be displayed to index and return the ones
+    to show. Without since, those are the facts that were new; the rest
+    duplicate a fact shown since they were generated. With since (the
+    snapshot passed to generate_unique_facts()), facts recorded after it,
+    e.g. by another session sharing the same request, don't count."""
+    shown = []
+    for fact in facts:
+        text = _index_text(fact)
+        if index.add(text) or (since is not None and index.find_duplicate(text, up_to=since) is None):
+            shown.append(fact)
+    return shown
+
+
+class FactPool:
+    """Pre-generated facts per (category, model), kept topped up by worker threads.
+
+    take() hands out ready facts immediately (skipping ones already shown)
+    and schedules refills so that pool climbs back to the caller's depth;
+    pools nobody has taken from are never filled. Each refill
+    asks for up to batch_size facts in one completion, and at most
+    max_refills refills run at once across all pools. With an index,
+    refills skip facts that are near-duplicates of any already shown.
+    """
+
+    def __init__(self, generate: Optional[Callable[[str, str, int], List[Dict[str, str]]]] = None,
+                 depth: int = 3, max_refills: int = 2, batch_size: int = 5,
+                 index: Optional[FactIndex] = None):
+        # Refills for one pool are identical requests; they must not be coalesced
+        # into a single call or every refill would return the same facts. They
+        # also wait behind requests someone is actively waiting for.
+        if generate is None and index is not None:
+            generate = functools.partial(generate_unique_facts, index=index, coalesce=False, priority=BACKGROUND)
+        self.generate = generate or functools.partial(generate_facts, coalesce=False, priority=BACKGROUND)
+        self.depth = depth
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max_refills, thread_name_prefix="fact-refill")
+        self._lock = threading.Lock()
+        self._pools: Dict[Tuple[str, str], Deque[Dict[str, str]]] = {}
+        self._pending: Dict[Tuple[str, str], int] = {}  # facts requested but not yet delivered
+
+    def size(self, category: str, model: str) -> int:
+        with self._lock:
+            return len(self._pools.get((category, model), ()))
+
+    def take(self, category: str, model: str, n: int = 1, exclude: Collection[str] = (),
+             depth: Optional[int] = None) -> List[Dict[str, str]]:
+        """Return up to n ready facts whose fact_key is not in exclude (possibly
+        none), then top the pool up to depth (the pool's default if None)."""
+        facts: List[Dict[str, str]] = []
+        with self._lock:
+            pool = self._pools.setdefault((category, model), deque())
+            while pool and len(facts) < n:
+                candidate = pool.popleft()
+                if fact_key(candidate) not in exclude:
+                    facts.append(candidate)
+        self.top_up(category, model, depth)
+        return facts
+
+    def pop(self, category: str, model: str, exclude: Collection[str] = (),
+            depth: Optional[int] = None) -> Optional[Dict[str, str]]:
+        """Return one ready fact, or None if none is ready."""
+        facts = self.take(category, model, 1, exclude, depth)
+        return facts[0] if facts else None
+
+    def top_up(self, category: str, model: str, depth: Optional[int] = None) -> None:
+        """Schedule enough batched refills to bring the pool back to depth."""
+        key = (category, model)
+        jobs = []
+        with self._lock:
+            pool = self._pools.setdefault(key, deque())
+            missing = (self.depth if depth is None else depth) - len(pool) - self._pending.get(key, 0)
+            while missing > 0:
+                size = min(missing, self.batch_size)
+                jobs.append(size)
+                missing -= size
+            self._pending[key] = self._pending.get(key, 0) + sum(jobs)
+        for size in jobs:
+            self._executor.submit(self._refill, key, size)
+
+    def _refill(self, key: Tuple[str, str], size: int) -> None:
+        try:
+            facts = self.generate(key[0], key[1], size)
+        except Exception:
+            facts = []  # a later take() schedules another attempt
+        with self._lock:
+            self._pending[key] -= size
+            pool = self._pools.setdefault(key, deque())
+            known = {fact_key(f) for f in pool}
+            for fact in facts:
+                if fact_key(fact) and fact_key(fact) not in known:
+                    known.add(fact_key(fact))
+                    pool.append(fact)
@@ -1,23 +1,17 @@
-import os
 import streamlit as st
-import openai
-from dotenv import load_dotenv
-import re
-import requests
-
-load_dotenv()
-API_KEY = os.getenv("API_KEY")
-
-# Initialize OpenAI client
-client = openai.OpenAI(
-    api_key=API_KEY,
-    base_url="https://api.poe.com/v1",
-)
+from datetime import datetime
+from image_cache import local_image
+from llm_client import cache_stats
+from recipe_pipeline import recipe_title, start_image, stream_recipe
+from recipe_store import get_recipe_store
 
 st.set_page_config(page_title="食譜探索器", page_icon="🍳", layout="wide")
 
 st.title("食譜探索器")
 st.caption("所有問題都係可選嘅 - 發揮你嘅創意！")
+# 相同嘅答案會直接用返快取入面嘅圖片，唔使再等模型
+stats = cache_stats()
+st.caption(f"快取：命中 {stats['hits']} 次／未命中 {stats['misses']} 次 · 同其他用戶共用請求 {stats['coalesced']} 次")
 
 with st.form("recipe_form"):
     question1 = st.selectbox(
@@ -56,6 +50,9 @@ with st.form("recipe_form"):
         help="有冇特定菜系風格？"
     )
     
+    # Same answers give back the saved recipe unless a new variation is asked for
+    new_variation = st.checkbox("🔁 同樣嘅答案都要一個新版本", help="唔用食譜紀錄入面嘅舊食譜，再創造一個唔同嘅")
+    
     generate_button = st.form_submit_button("✨ 創造我嘅食譜", use_container_width=True, type="primary")
 
 if generate_button:
@@ -107,132 +104,73 @@ if generate_button:
 
 用繁體中文（粵語）寫，要簡潔、有創意、溫暖。食譜要簡短，重點突出，避免冗長描述。"""
     
-    with st.spinner("生成緊食譜..."):
-        try:
-            response = client.chat.completions.create(
-                model="gemini-2.5-pro",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                stream=False
-            )
-            
-            recipe = response.choices[0].message.content
-            
-            # Extract recipe title (first line or first heading)
-            recipe_title = "美味食譜"
-            lines = recipe.split('\n')
-            for line in lines[:5]:  # Check first 5 lines
-                line = line.strip()
-                if line and not line.startswith('#') and len(line) < 100:
-                    # Remove markdown formatting
-                    recipe_title = re.sub(r'^#+\s*', '', line)
-                    recipe_title = re.sub(r'\*\*', '', recipe_title)
-                    recipe_title = recipe_title.strip()
-                    if recipe_title:
-                        break
-            
-            # Generate image prompt using AI
-            image_prompt_text = f"""為呢個食譜創造一個詳細嘅圖片生成提示：{recipe_title}
-            
-            考慮：
-            - 心情：{question1 if question1 else '任何'}
-            - 顏色主題：{question2 if question2 else '任何'}
-            - 時段：{question3 if question3 else '任何'}
-            - 食譜描述：{recipe[:200]}...
-            
-            只返回一個簡潔、詳細嘅圖片提示（唔好解釋），適合用嚟創造一張吸引、專業嘅食物照片。用繁體中文寫圖片提示。"""
-            
-            image_url = None
-            
+    answers = {
+        "question1": question1,
+        "question2": question2,
+        "question3": question3,
+        "question4": question4,
+        "question5": question5,
+        "question6": question6
+    }
+    
+    recipe_store = get_recipe_store()
+    previous = recipe_store.find(answers)
+    if previous and not new_variation:
+        # Same answers as an earlier recipe: show it straight from the history
+        stored = previous[0]
+        st.success("呢個組合之前整過，即刻攞返上次嘅食譜！想要新版本可以剔「同樣嘅答案都要一個新版本」。")
+        if stored.image_url:
+            st.image(local_image(stored.image_url), caption=stored.title, use_container_width=True)
+            st.divider()
+        st.markdown(stored.recipe)
+        st.session_state.last_recipe = stored.recipe
+        st.session_state.last_image_url = stored.image_url
+        st.session_state.recipe_preferences = answers
+    else:
+        if previous:
+            user_prompt += "\n\n之前已經用同樣嘅元素整過以下食譜，今次要一個明顯唔同嘅新版本：" + "、".join(r.title for r in previous)
+        
+        # The image only needs the form answers, so it is generated while the recipe streams
+        image_future = start_image(answers, user_prompt)
+        image_slot = st.empty()
+        
+        def show_image(caption=None):
+            """Put the image in its slot once ready; returns the URL or None."""
             try:
-                # Generate optimized image prompt
-                image_prompt_response = client.chat.completions.create(
-                    model="gemini-2.5-pro",
-                    messages=[
-                        {"role": "user", "content": image_prompt_text}
-                    ],
-                    stream=False
-                )
-                image_prompt = image_prompt_response.choices[0].message.content.strip()
-                
-                # Generate image using Qwen-Image (following basic_openai.py pattern)
-                with st.spinner("用 Qwen-Image 生成緊圖片..."):
-                    try:
-                        # Use chat completions with Qwen-Image model (as shown in basic_openai.py)
-                        qwen_response = client.chat.completions.create(
-                            model="Qwen-Image",
-                            messages=[
-                                {"role": "user", "content": image_prompt}
-                            ],
-                            extra_body={
-                                "aspect": "3:2",    # Options: "1:1", "3:2", "2:3", "auto"
-                                "quality": "high"   # Options: "low", "medium", "high"
-                            },
-                            stream=False
-                        )
-                        # Get image URL from response content (as shown in basic_openai.py)
-                        image_url = qwen_response.choices[0].message.content
-                        
-                        # Extract URL if it's embedded in text
-                        url_match = re.search(r'https?://[^\s\)]+', image_url)
-                        if url_match:
-                            image_url = url_match.group(0)
-                            
-                    except Exception as qwen_error:
-                        # Fallback: try with simple prompt
-                        try:
-                            color_name = {"紅色": "red", "橙色": "orange", "黃色": "yellow", "綠色": "green", "藍色": "blue", "紫色": "purple", "粉紅色": "pink", "白色": "white", "黑色": "black", "金色": "gold"}.get(question2, "")
-                            simple_prompt = f"A beautiful, professional food photograph of {recipe_title}"
-                            if color_name:
-                                simple_prompt += f" with {color_name} color accents"
-                            simple_prompt += ", appetizing, well-lit, high quality"
-                            
-                            qwen_response = client.chat.completions.create(
-                                model="Qwen-Image",
-                                messages=[
-                                    {"role": "user", "content": simple_prompt}
-                                ],
-                                extra_body={
-                                    "aspect": "3:2",
-                                    "quality": "high"
-                                },
-                                stream=False
-                            )
-                            image_url = qwen_response.choices[0].message.content
-                            url_match = re.search(r'https?://[^\s\)]+', image_url)
-                            if url_match:
-                                image_url = url_match.group(0)
-                        except Exception as e:
-                            raise Exception(f"Qwen-Image generation failed: {str(e)}")
-                            
+                image_url = image_future.result()
             except Exception as img_error:
                 error_msg = str(img_error)
-                st.info(f"💡 圖片生成不可用：{error_msg[:150]}。食譜已成功生成！")
-            
+                image_slot.info(f"💡 圖片生成不可用：{error_msg[:150]}。食譜已成功生成！")
+                return None
+            with image_slot.container():
+                st.image(local_image(image_url), caption=caption, use_container_width=True)
+                st.divider()
+            return image_url
+        
+        def recipe_text():
+            """Stream the recipe, swapping the image in as soon as it is ready."""
+            image_shown = False
+            for text in stream_recipe(system_prompt, user_prompt):
+                if not image_shown and image_future.done():
+                    show_image()
+                    image_shown = True
+                yield text
+        
+        try:
+            with st.spinner("生成緊食譜..."):
+                recipe = st.write_stream(recipe_text())
+        
+            with st.spinner("用 Qwen-Image 生成緊圖片..."):
+                image_url = show_image(caption=recipe_title(recipe))
+        
             st.balloons()
             st.success("食譜已生成！")
-            st.divider()
-            
-            # Display image if generated
-            if image_url:
-                st.image(image_url, caption=recipe_title, use_container_width=True)
-                st.divider()
-            
-            st.markdown(recipe)
-            
+        
+            recipe_store.save(answers, recipe_title(recipe), recipe, image_url)
             st.session_state.last_recipe = recipe
             st.session_state.last_image_url = image_url
-            st.session_state.recipe_preferences = {
-                "question1": question1,
-                "question2": question2,
-                "question3": question3,
-                "question4": question4,
-                "question5": question5,
-                "question6": question6
-            }
-            
+            st.session_state.recipe_preferences = answers
+        
         except Exception as e:
             st.error(f"生成食譜時出錯：{str(e)}")
             st.info("請檢查你嘅 API 金鑰同連線，然後再試一次。")
@@ -240,6 +178,21 @@ if generate_button:
 if "last_recipe" in st.session_state:
     with st.expander("查看上次生成嘅食譜"):
         if "last_image_url" in st.session_state and st.session_state.last_image_url:
-            st.image(st.session_state.last_image_url, use_container_width=True)
+            st.image(local_image(st.session_state.last_image_url), use_container_width=True)
         st.markdown(st.session_state.last_recipe)
 
+with st.expander("🔎 用食材搵返以前嘅食譜"):
+    ingredient_query = st.text_input("食材", placeholder="例如：雞肉、番茄", key="history_ingredients")
+    if ingredient_query:
+        matches = get_recipe_store().search_ingredients(ingredient_query)
+        if matches:
+            match = st.selectbox(
+                f"搵到 {len(matches)} 個食譜",
+                matches,
+                format_func=lambda r: f"{r.title}（{r.answers['question4']} · {datetime.fromtimestamp(r.created_at):%Y-%m-%d}）"
+            )
+            if match.image_url:
+                st.image(local_image(match.image_url), use_container_width=True)
+            st.markdown(match.recipe)
+        else:
+            st.caption("食譜紀錄入面未有用呢啲食材嘅食譜。")
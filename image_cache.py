@@ -0,0 +1,145 @@
+"""
+Local cache for generated images.
+
+Images are downloaded once and stored under .image_cache/ by the sha256 of
+their bytes, so the same picture behind different URLs is kept only once.
+Resized thumbnails are stored alongside them. st.image is then given a
+local file, so reruns and the "last recipe" expander load nothing from the
+remote host:
+
+    st.image(local_image(image_url))
+
+When the directory grows past max_bytes the least recently used files
+are deleted.
+"""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Optional
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+from ttl_cache import TTLCache
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".image_cache")
+THUMBNAIL_WIDTH = 1024
+
+
+class ImageCache:
+    """Content-addressed, size-bounded image store with thumbnails."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = 200 * 1024 * 1024,
+                 timeout: float = 30.0, url_ttl: float = 30 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        try:
+            # URL -> content hash, so a known URL is not downloaded again
+            self._urls = TTLCache(maxsize=1024, ttl=url_ttl, path=os.path.join(directory, "urls.sqlite3"),
+                                  table="image_urls")
+        except sqlite3.Error:
+            self._urls = TTLCache(maxsize=1024, ttl=url_ttl)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "cuhk-ai-course-recipe/1.0"
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write(self, name: str, data: bytes) -> str:
+        # write then rename, so readers never see a half-written file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(name))
+        return self._path(name)
+
+    def _touch(self, path: str) -> bool:
+        try:
+            os.utime(path)  # mtime doubles as last-used time for eviction
+            return True
+        except FileNotFoundError:
+            return False
+
+    def fetch(self, url: str) -> str:
+        """Return the content hash of the image at url, downloading it if needed."""
+        digest = self._urls.get(url)
+        if digest is not None and self._touch(self._path(digest)):
+            return digest
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.content
+        digest = hashlib.sha256(data).hexdigest()
+        if not self._touch(self._path(digest)):
+            self._write(digest, data)
+            self._evict()
+        self._urls.set(url, digest)
+        return digest
+
+    def thumbnail(self, digest: str, width: int = THUMBNAIL_WIDTH) -> str:
+        """Path of a JPEG copy of the image at most width pixels wide."""
+        path = self._path(f"{digest}_{width}.jpg")
+        if self._touch(path):
+            return path
+        with Image.open(self._path(digest)) as image:
+            image.thumbnail((width, width * 4))
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, "JPEG", quality=85)
+        os.replace(tmp, path)
+        self._evict()
+        return path
+
+    def get(self, url: str, width: Optional[int] = THUMBNAIL_WIDTH) -> str:
+        """Local path of the image at url (a thumbnail unless width is None)."""
+        digest = self.fetch(url)
+        return self._path(digest) if width is None else self.thumbnail(digest, width)
+
+    def _evict(self) -> None:
+        with self._lock:
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.startswith("urls.sqlite3") \
+                        and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+_cache: Optional[ImageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageCache()
+        return _cache
+
+
+def local_image(url: str, width: Optional[int] = THUMBNAIL_WIDTH) -> str:
+    """Cached local copy of url for st.image, or url itself if it can't be fetched."""
+    try:
+        return get_image_cache().get(url, width)
+    except Exception:
+        return url
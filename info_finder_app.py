@@ -1,35 +1,61 @@
 import os
+import threading
+from contextlib import closing
 import streamlit as st
-from search_utils import search_repo, wiki_search_summary
+from search_utils import iter_search_repo, refresh, wiki_lookup
+from wiki_offline import get_offline_wiki
 
 WORKSPACE_ROOT = os.path.dirname(__file__)
 
+# Keep the local search index in step with edits made since the last rerun
+try:
+    refresh(WORKSPACE_ROOT)
+except Exception:
+    pass  # search_repo falls back to scanning files directly
+
 st.set_page_config(page_title="Info Finder", layout="wide")
 st.title("Info Finder — 在本地或 Wikipedia 搜尋資訊")
 
 query = st.text_input("輸入查詢內容", value="", placeholder="例如：人工智慧、Python list comprehension")
 source = st.radio("搜尋來源", ("Local repo", "Wikipedia"))
+# Off by default: unranked hits show up as they are found, ranked ones only once all are scored
+ranked = st.checkbox("按相關度排序", value=False, help="用 BM25 將最相關嘅結果排喺最前（要等全部結果計完分先會顯示）")
 
 if st.button("Search") and query.strip():
     q = query.strip()
     if source == "Local repo":
-        with st.spinner("搜尋本機專案檔案..."):
-            results = search_repo(q, root=WORKSPACE_ROOT, max_results=50)
-        if not results:
-            st.info("在本專案中找不到相關結果。")
-        else:
-            st.markdown(f"**找到 {len(results)} 筆結果（最多顯示 50 筆）**")
-            for path, lineno, line in results:
+        # Stop a scan left running by the previous rerun (e.g. the query was changed mid-scan)
+        previous = st.session_state.get("search_cancel")
+        if previous is not None:
+            previous.set()
+        cancel = st.session_state.search_cancel = threading.Event()
+
+        status = st.empty()
+        status.markdown("搜尋本機專案檔案...")
+        count = 0
+        matches = iter_search_repo(q, root=WORKSPACE_ROOT, max_results=50, ranked=ranked, cancel=cancel)
+        with closing(matches):
+            for path, lineno, line in matches:
+                count += 1
+                status.markdown(f"**搜尋中... 已找到 {count} 筆結果**")
                 st.markdown(f"- **{path}** — 行 {lineno}")
                 st.code(line)
+        if not count:
+            status.info("在本專案中找不到相關結果。")
+        else:
+            status.markdown(f"**找到 {count} 筆結果（最多顯示 50 筆）**")
     else:
         with st.spinner("向 Wikipedia 查詢..."):
-            title, summary = wiki_search_summary(q)
-        if not title:
+            title, summary, status = wiki_lookup(q)
+        if status == "error":
+            st.warning("暫時連唔到 Wikipedia，請稍後再試。")
+        elif not title:
             st.info("Wikipedia 查無結果。可嘗試更換關鍵字。")
         else:
             st.header(title)
             st.write(summary)
+            if get_offline_wiki() is not None:
+                st.caption("（來自本機離線 Wikipedia 索引）")
             st.markdown(f"[在 Wikipedia 上查看]({'https://en.wikipedia.org/wiki/' + title.replace(' ', '_')})")
 
 st.markdown("---")
@@ -1,14 +1,5 @@
-import os
 import streamlit as st
-import openai
-from dotenv import load_dotenv
-
-load_dotenv()
-API_KEY = os.getenv("API_KEY")
-client = openai.OpenAI(
-    api_key=API_KEY,
-    base_url="https://api.poe.com/v1",
-)
+from llm_client import API_KEY, chat_completion
 
 
 # Page configuration
@@ -40,7 +31,7 @@ def generate_ai_response(user_prompt):
         return "API key not set. Please set API_KEY in environment variables."
     
     try:
-        resp = client.chat.completions.create(
+        resp = chat_completion(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -158,7 +149,7 @@ if prompt := st.chat_input("Your message:"):
         ai_text = "API key not set. Please set API_KEY in environment variables or .env file."
     else:
         try:
-            resp = client.chat.completions.create(
+            resp = chat_completion(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": system_prompt},
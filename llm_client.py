@@ -0,0 +1,482 @@
+"""
+Shared OpenAI-compatible client for all the apps in this folder.
+
+Instead of each script calling load_dotenv() and building its own
+openai.OpenAI(...) at module top level (which Streamlit re-runs on every
+interaction), import the client from here:
+
+    from llm_client import get_client
+    client = get_client()
+
+Inside a Streamlit app the client is created once per process with
+st.cache_resource and shared by every session, so its pooled keep-alive
+connections are reused across reruns and users. Plain Python scripts get
+the same single client through an ordinary process-wide cache.
+
+Apps send their requests through chat_completion(), a drop-in for
+client.chat.completions.create(...) that can answer repeated identical
+requests from a response cache when the caller allows it (cache=True), and
+that merges identical requests made at the same time into one call.
+
+hedged_completion() sends a request to a primary model and, when that model
+is slower than its usual p95 latency (or fails), also to a backup model,
+returning whichever answers first.
+
+Requests made through chat_completion() and hedged_completion() pass a
+process-wide token-bucket rate limiter, in which interactive requests go
+ahead of background ones (priority=BACKGROUND, e.g. prefetching), and
+rate-limit errors, timeouts and 5xx responses are retried with jittered
+exponential backoff that honours Retry-After. Calls made directly on
+get_client() skip the limiter but keep the SDK's own retries.
+"""
+
+import hashlib
+import json
+import email.utils
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import openai
+from dotenv import load_dotenv
+from openai.types.chat import ChatCompletion
+
+from ttl_cache import TTLCache
+
+load_dotenv()
+API_KEY = os.getenv("API_KEY")
+BASE_URL = os.getenv("API_BASE_URL", "https://api.poe.com/v1")
+
+# Connection pool shared by all requests of the process
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 120  # seconds an idle connection is kept open
+
+RESPONSE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache.sqlite3")
+RESPONSE_CACHE_TTL = 24 * 3600
+
+# Wait this long before hedging while a model has too few recorded latencies
+DEFAULT_HEDGE_DELAY = 10.0
+
+# Upstream requests per second for the whole process, and the burst allowed
+RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "5"))
+RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5   # seconds before the first retry (before jitter)
+BACKOFF_MAX = 30.0
+
+# Request priorities: interactive requests are sent before background ones
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+def _process_cache(func):
+    """st.cache_resource when running under Streamlit, otherwise lru_cache."""
+    try:
+        import streamlit as st
+        from streamlit import runtime
+        if runtime.exists():
+            return st.cache_resource(show_spinner=False)(func)
+    except ImportError:
+        pass
+    return lru_cache(maxsize=None)(func)
+
+
+@_process_cache
+def get_client() -> openai.OpenAI:
+    """Return the process-wide client, built on first use."""
+    # Build the limits with the SDK's own transport types; the SDK may not
+    # be on the same HTTP package version as a separately installed httpx
+    limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    timeout = openai.Timeout(120.0, connect=10.0)
+    http_client = openai.DefaultHttpxClient(limits=limits, timeout=timeout)
+    return openai.OpenAI(api_key=API_KEY, base_url=BASE_URL, http_client=http_client, timeout=timeout)
+
+
+@_process_cache
+def _upstream_client() -> openai.OpenAI:
+    # Same connection pool as get_client(), but without the SDK's retries:
+    # _create() retries itself and also backs off the rate limiter
+    return get_client().with_options(max_retries=0)
+
+
+def _open_response_cache() -> TTLCache:
+    try:
+        return TTLCache(maxsize=512, ttl=RESPONSE_CACHE_TTL, path=RESPONSE_CACHE_PATH,
+                        table="chat_completions", disk_maxsize=20_000)
+    except sqlite3.Error:
+        # e.g. a read-only checkout: keep the in-memory tier only
+        return TTLCache(maxsize=512, ttl=RESPONSE_CACHE_TTL)
+
+
+_response_cache = _open_response_cache()
+_stats = {"hits": 0, "misses": 0, "coalesced": 0, "hedged": 0, "backup_wins": 0, "retries": 0}
+_stats_lock = threading.Lock()
+
+
+def request_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """Content address of a request: a hash of the model, messages and sampling parameters."""
+    payload = json.dumps({"model": model, "messages": messages, "params": params},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Lets concurrent calls with the same key share one execution.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running wait for it and receive the same result (or
+    exception). Once it finishes the key is free again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (result, shared), where shared is True if another caller's result was reused."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+_in_flight = SingleFlight()
+
+
+class LatencyTracker:
+    """Recent upstream latencies per model (and per streaming/non-streaming)."""
+
+    def __init__(self, window: int = 200, min_samples: int = 5):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, bool], Deque[float]] = {}
+
+    def record(self, model: str, stream: bool, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault((model, stream), deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model: str, stream: bool, q: float) -> Optional[float]:
+        """The q-quantile (0..1) of recent latencies, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._samples.get((model, stream), ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """{"model" or "model (stream)": {"p50", "p95", "n"}} for every model seen."""
+        with self._lock:
+            keys = list(self._samples)
+        result = {}
+        for model, stream in keys:
+            p50, p95 = self.percentile(model, stream, 0.5), self.percentile(model, stream, 0.95)
+            if p50 is not None:
+                result[f"{model} (stream)" if stream else model] = {
+                    "p50": p50, "p95": p95, "n": len(self._samples[(model, stream)])
+                }
+        return result
+
+
+_latency = LatencyTracker()
+
+
+class RateLimiter:
+    """Token bucket shared by every upstream request of the process.
+
+    acquire() takes one token, waiting while the bucket is empty. Waiting
+    callers of a more urgent priority (lower number) are always served
+    first, and pause() stops everyone for a while, e.g. after a 429 with
+    Retry-After.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = [0, 0]  # callers waiting per priority
+
+    def acquire(self, priority: int = INTERACTIVE) -> None:
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    ahead = sum(self._waiting[:priority])
+                    if now >= self._paused_until and self._tokens >= 1 and not ahead:
+                        self._tokens -= 1
+                        return
+                    if now < self._paused_until:
+                        timeout = self._paused_until - now
+                    elif self._tokens < 1:
+                        timeout = (1 - self._tokens) / self.rate
+                    else:
+                        timeout = None  # a more urgent caller takes the token and notifies us
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all requests for the next seconds."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_limiter = RateLimiter(RATE_LIMIT, RATE_LIMIT_BURST)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the Retry-After(-ms) header of an API error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _should_retry(error: Exception) -> bool:
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _send(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any],
+          priority: int = INTERACTIVE) -> Tuple[Any, float]:
+    """Rate-limited create call with retries. Returns the response and the
+    perf_counter() time the successful attempt was sent, so latencies
+    exclude queueing in the limiter and backoff sleeps."""
+    for attempt in range(MAX_RETRIES + 1):
+        _limiter.acquire(priority)
+        start = time.perf_counter()
+        try:
+            response = _upstream_client().chat.completions.create(model=model, messages=messages, **params)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not _should_retry(e):
+                raise
+            # full jitter, but never sooner than the server asked for
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, BACKOFF_MAX))
+                if isinstance(e, openai.RateLimitError):
+                    _limiter.pause(delay)
+            with _stats_lock:
+                _stats["retries"] += 1
+            time.sleep(delay)
+            continue
+        return response, start
+
+
+def _create(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any],
+            priority: int = INTERACTIVE):
+    response, start = _send(model, messages, params, priority)
+    if not params.get("stream"):
+        # for streams, hedged_completion() records the time to the first chunk
+        _latency.record(model, False, time.perf_counter() - start)
+    return response
+
+
+def friendly_error(error: Exception) -> str:
+    """A short message for users about a failed request, without the raw API error."""
+    if isinstance(error, openai.RateLimitError):
+        return "The AI service is busy right now. Please wait a moment and try again."
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return "Couldn't reach the AI service. Please check your connection and try again."
+    if isinstance(error, openai.AuthenticationError):
+        return "The AI service rejected the API key. Please check API_KEY in your .env file."
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return "The AI service is having problems. Please try again in a little while."
+    return "Something went wrong while getting a reply. Please try again."
+
+
+def chat_completion(model: str, messages: List[Dict[str, Any]], cache: bool = False,
+                    cache_ttl: Optional[float] = None, coalesce: bool = True,
+                    priority: int = INTERACTIVE, **params):
+    """Call chat.completions.create on the shared client.
+
+    With cache=True an identical earlier request (same model, messages and
+    parameters) is answered from the response cache, kept in memory (LRU +
+    TTL) and in a SQLite file, instead of calling the API. Only use it
+    where repeating an earlier answer is acceptable.
+
+    With coalesce=True (the default) identical requests that are in flight
+    at the same time, e.g. from several Streamlit sessions, share a single
+    upstream call and all receive its response.
+
+    Streaming requests are never cached or coalesced.
+
+    Pass priority=BACKGROUND for requests nobody is waiting for yet, so they
+    queue behind interactive ones when the rate limit is reached.
+    """
+    if params.get("stream") or not (cache or coalesce):
+        return _create(model, messages, params, priority)
+    key = request_key(model, messages, params)
+    if cache:
+        cached = _response_cache.get(key)
+        with _stats_lock:
+            _stats["hits" if cached is not None else "misses"] += 1
+        if cached is not None:
+            return ChatCompletion.model_validate(cached)
+
+    def fetch():
+        response = _create(model, messages, params, priority)
+        if cache:
+            _response_cache.set(key, response.model_dump(mode="json"), ttl=cache_ttl)
+        return response
+
+    if not coalesce:
+        return fetch()
+    response, shared = _in_flight.do(key, fetch)
+    if shared:
+        with _stats_lock:
+            _stats["coalesced"] += 1
+    return response
+
+
+def cache_stats() -> Dict[str, int]:
+    """Counts since the process started: response cache hits and misses,
+    requests that were coalesced into another session's identical call, and
+    hedged requests (and how many of those the backup model won), and
+    upstream calls retried after a transient error."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class HedgedStream:
+    """The stream that won a hedged request; iterate it like the openai stream."""
+
+    def __init__(self, model: str, first_chunk: Any, chunks: Iterator[Any], stream: Any):
+        self.model = model
+        self._first_chunk = first_chunk
+        self._chunks = chunks
+        self._stream = stream
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._first_chunk is not None:
+            yield self._first_chunk
+        yield from self._chunks
+
+    def close(self) -> None:
+        if hasattr(self._stream, "close"):
+            self._stream.close()  # closes the HTTP response
+
+
+# Runs the competing requests of hedged_completion()
+_hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+def _open_stream(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any],
+                 priority: int) -> HedgedStream:
+    stream, start = _send(model, messages, params, priority)
+    chunks = iter(stream)
+    try:
+        first_chunk = next(chunks)
+    except StopIteration:
+        first_chunk = None
+    _latency.record(model, True, time.perf_counter() - start)
+    return HedgedStream(model, first_chunk, chunks, stream)
+
+
+def _discard(future: Future) -> None:
+    # the other request won: close a losing stream as soon as it opens
+    if not future.cancelled() and future.exception() is None and isinstance(future.result(), HedgedStream):
+        future.result().close()
+
+
+def hedged_completion(models: Sequence[str], messages: List[Dict[str, Any]],
+                      hedge_after: Optional[float] = None, priority: int = INTERACTIVE, **params):
+    """chat_completion() with a backup model for slow or failed requests.
+
+    The request goes to models[0]. If it has not answered after that model's
+    recent p95 latency (hedge_after overrides it), or fails with an error
+    worth retrying (rate limit, timeout, 5xx), the same request also goes to
+    models[1], and whichever succeeds first is returned. Errors such as 400
+    or 401 are raised without bothering the backup. For
+    streaming requests "answered" means the first chunk arrived; the result
+    is then a HedgedStream and the losing stream is closed. A losing
+    non-streaming request cannot be aborted mid-flight, so its answer is
+    simply dropped.
+
+    The model that answered is response.model (HedgedStream.model for streams).
+    """
+    if len(models) < 2:
+        return chat_completion(models[0], messages, priority=priority, **params)
+    primary, backup = models[0], models[1]
+    stream = bool(params.get("stream"))
+
+    def call(model: str):
+        if stream:
+            return _open_stream(model, messages, params, priority)
+        return chat_completion(model, messages, priority=priority, **params)
+
+    if hedge_after is None:
+        hedge_after = _latency.percentile(primary, stream, 0.95) or DEFAULT_HEDGE_DELAY
+    first = _hedge_pool.submit(call, primary)
+    futures = [first]
+    wait(futures, timeout=hedge_after)
+    if not first.done() or (first.exception() is not None and _should_retry(first.exception())):
+        futures.append(_hedge_pool.submit(call, backup))
+        with _stats_lock:
+            _stats["hedged"] += 1
+
+    pending = set(futures)
+    winner = None
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next((f for f in futures if f in done and f.exception() is None), None)
+    for future in pending:
+        if not future.cancel():
+            future.add_done_callback(_discard)
+    if winner is None:
+        raise first.exception()
+    if winner is not first:
+        with _stats_lock:
+            _stats["backup_wins"] += 1
+    return winner.result()
+
+
+def latency_stats() -> Dict[str, Dict[str, float]]:
+    """Recent p50/p95 upstream latency (seconds) and sample count per model."""
+    return _latency.snapshot()
@@ -0,0 +1,122 @@
+"""
+Recipe + image pipeline for food_recipe_generator.py.
+
+The image only depends on the form answers, so its two calls (image prompt,
+then Qwen-Image) start on a worker thread as soon as the form is submitted
+and run while the recipe streams in. Total latency is then about the
+slower of the two instead of their sum:
+
+    image_future = start_image(answers, user_prompt)
+    for text in stream_recipe(system_prompt, user_prompt):
+        ...                       # show text; check image_future.done()
+    image_url = image_future.result()
+"""
+
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator
+
+from image_cache import local_image
+from llm_client import chat_completion, hedged_completion
+
+# Primary model, then the backup that is also asked when the primary is slow
+RECIPE_MODELS = ("gemini-2.5-pro", "gpt-4")
+IMAGE_PROMPT_MODELS = ("gemini-2.5-pro", "gpt-4")
+IMAGE_MODEL = "Qwen-Image"
+IMAGE_OPTIONS = {
+    "aspect": "3:2",    # Options: "1:1", "3:2", "2:3", "auto"
+    "quality": "high"   # Options: "low", "medium", "high"
+}
+COLOR_NAMES = {"紅色": "red", "橙色": "orange", "黃色": "yellow", "綠色": "green", "藍色": "blue",
+               "紫色": "purple", "粉紅色": "pink", "白色": "white", "黑色": "black", "金色": "gold"}
+
+# Image generation for all sessions; each job makes two or three slow API calls
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="recipe-image")
+
+
+def recipe_title(recipe: str) -> str:
+    """First short non-heading line of the recipe, without markdown formatting."""
+    for line in recipe.split('\n')[:5]:  # Check first 5 lines
+        line = line.strip()
+        if line and not line.startswith('#') and len(line) < 100:
+            title = re.sub(r'^#+\s*', '', line)
+            title = re.sub(r'\*\*', '', title).strip()
+            if title:
+                return title
+    return "美味食譜"
+
+
+def stream_recipe(system_prompt: str, user_prompt: str) -> Iterator[str]:
+    """Yield the recipe text as the model writes it."""
+    stream = hedged_completion(
+        RECIPE_MODELS,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        stream=True
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _image_url(prompt: str) -> str:
+    response = chat_completion(
+        model=IMAGE_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        extra_body=IMAGE_OPTIONS,
+        stream=False,
+        cache=True
+    )
+    # The image URL comes back as the message content, possibly inside text
+    content = response.choices[0].message.content
+    url_match = re.search(r'https?://[^\s\)]+', content)
+    return url_match.group(0) if url_match else content
+
+
+def generate_image(answers: Dict[str, str], user_prompt: str) -> str:
+    """Write an image prompt for the dish described by the form answers, then
+    render it with Qwen-Image. Returns the image URL."""
+    image_prompt_text = f"""為以下要求創造嘅食譜寫一個詳細嘅圖片生成提示：
+
+    考慮：
+    - 心情：{answers.get('question1') or '任何'}
+    - 顏色主題：{answers.get('question2') or '任何'}
+    - 時段：{answers.get('question3') or '任何'}
+    - 食譜要求：{user_prompt[:300]}
+
+    只返回一個簡潔、詳細嘅圖片提示（唔好解釋），適合用嚟創造一張吸引、專業嘅食物照片。用繁體中文寫圖片提示。"""
+    response = hedged_completion(
+        IMAGE_PROMPT_MODELS,
+        messages=[{"role": "user", "content": image_prompt_text}],
+        stream=False,
+        cache=True
+    )
+    image_prompt = response.choices[0].message.content.strip()
+    try:
+        return _image_url(image_prompt)
+    except Exception:
+        # Fallback: try with simple prompt
+        dish = answers.get('question6') or answers.get('question4') or "a creative dish"
+        simple_prompt = f"A beautiful, professional food photograph of {dish}"
+        color_name = COLOR_NAMES.get(answers.get('question2'), "")
+        if color_name:
+            simple_prompt += f" with {color_name} color accents"
+        simple_prompt += ", appetizing, well-lit, high quality"
+        try:
+            return _image_url(simple_prompt)
+        except Exception as e:
+            raise Exception(f"Qwen-Image generation failed: {str(e)}")
+
+
+def _generate_and_cache(answers: Dict[str, str], user_prompt: str) -> str:
+    image_url = generate_image(answers, user_prompt)
+    local_image(image_url)  # download and thumbnail it off the main thread too
+    return image_url
+
+
+def start_image(answers: Dict[str, str], user_prompt: str) -> Future:
+    """Start generate_image on a worker thread; the future holds the URL.
+    The image is already in the local image cache when the future is done."""
+    return _executor.submit(_generate_and_cache, answers, user_prompt)
@@ -0,0 +1,137 @@
+"""
+Persistent history of generated recipes for food_recipe_generator.py.
+
+Every recipe is saved in SQLite with the form answers it was made from.
+Answers are normalized (trimmed, lowercased, ingredients split and sorted)
+into a key, so the same mood/colour/time/ingredients combination finds its
+earlier recipes through an index instead of a new generation. Ingredients
+are also indexed one by one for "what can I make with ..." searches.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".recipe_store.sqlite3")
+QUESTIONS = ("question1", "question2", "question3", "question4", "question5", "question6")
+
+_INGREDIENT_SPLIT_RE = re.compile(r"[,，、;；/\n]+|\s+(?:and|&)\s+")
+
+
+class StoredRecipe(NamedTuple):
+    id: int
+    answers: Dict[str, str]
+    title: str
+    recipe: str
+    image_url: Optional[str]
+    created_at: float
+
+
+def parse_ingredients(text: str) -> List[str]:
+    """Split a free-text ingredient list into sorted, distinct, lowercased items."""
+    items = (" ".join(part.split()).lower().strip(" .。…") for part in _INGREDIENT_SPLIT_RE.split(text or ""))
+    return sorted({item for item in items if item})
+
+
+def normalize_answers(answers: Dict[str, str]) -> Tuple[str, ...]:
+    """The question1-question6 answers in canonical form; equal tuples mean the same request."""
+    normalized = []
+    for question in QUESTIONS:
+        value = answers.get(question) or ""
+        if question == "question4":
+            normalized.append("、".join(parse_ingredients(value)))
+        else:
+            normalized.append(" ".join(value.split()).lower())
+    return tuple(normalized)
+
+
+def _answers_key(answers: Dict[str, str]) -> str:
+    return "\x1f".join(normalize_answers(answers))
+
+
+class RecipeStore:
+    """SQLite-backed recipe history, safe to share between sessions."""
+
+    def __init__(self, path: Optional[str] = DEFAULT_STORE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS recipes ("
+                " id INTEGER PRIMARY KEY, answers_key TEXT NOT NULL,"
+                " question1 TEXT, question2 TEXT, question3 TEXT, question4 TEXT, question5 TEXT, question6 TEXT,"
+                " title TEXT NOT NULL, recipe TEXT NOT NULL, image_url TEXT, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS recipes_by_answers ON recipes (answers_key, created_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS recipe_ingredients ("
+                " ingredient TEXT NOT NULL, recipe_id INTEGER NOT NULL,"
+                " PRIMARY KEY (ingredient, recipe_id)) WITHOUT ROWID"
+            )
+
+    def _rows(self, where: str, params: tuple) -> List[StoredRecipe]:
+        rows = self._conn.execute(
+            f"SELECT id, {', '.join(QUESTIONS)}, title, recipe, image_url, created_at FROM recipes {where}",
+            params,
+        ).fetchall()
+        return [StoredRecipe(row[0], dict(zip(QUESTIONS, row[1:7])), *row[7:]) for row in rows]
+
+    def save(self, answers: Dict[str, str], title: str, recipe: str, image_url: Optional[str] = None) -> int:
+        """Store a generated recipe; returns its id."""
+        with self._lock, self._conn:
+            recipe_id = self._conn.execute(
+                f"INSERT INTO recipes (answers_key, {', '.join(QUESTIONS)}, title, recipe, image_url, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (_answers_key(answers), *(answers.get(q) or "" for q in QUESTIONS),
+                 title, recipe, image_url, time.time()),
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO recipe_ingredients VALUES (?, ?)",
+                [(item, recipe_id) for item in parse_ingredients(answers.get("question4") or "")],
+            )
+        return recipe_id
+
+    def find(self, answers: Dict[str, str], limit: int = 10) -> List[StoredRecipe]:
+        """Earlier recipes made from the same (normalized) answers, newest first."""
+        with self._lock:
+            return self._rows("WHERE answers_key = ? ORDER BY created_at DESC LIMIT ?",
+                              (_answers_key(answers), limit))
+
+    def search_ingredients(self, ingredients: str, limit: int = 20) -> List[StoredRecipe]:
+        """Recipes using any of the given ingredients, most matching ingredients first."""
+        items = parse_ingredients(ingredients)
+        if not items:
+            return []
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                f"SELECT recipe_id FROM recipe_ingredients WHERE ingredient IN ({', '.join('?' * len(items))})"
+                " GROUP BY recipe_id ORDER BY COUNT(*) DESC, recipe_id DESC LIMIT ?",
+                (*items, limit),
+            )]
+            if not ids:
+                return []
+            by_id = {r.id: r for r in self._rows(f"WHERE id IN ({', '.join('?' * len(ids))})", tuple(ids))}
+        return [by_id[i] for i in ids if i in by_id]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+
+_store: Optional[RecipeStore] = None
+_store_lock = threading.Lock()
+
+
+def get_recipe_store() -> RecipeStore:
+    """Return the shared on-disk store (in memory only if the file can't be opened)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = RecipeStore()
+            except sqlite3.Error:
+                _store = RecipeStore(path=None)
+        return _store
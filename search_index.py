@@ -0,0 +1,328 @@
+import hashlib
+import heapq
+import io
+import itertools
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+INDEX_FILENAME = ".search_index.sqlite3"
+SEARCH_EXTENSIONS = ('.py', '.md', '.txt', '.rst')
+SKIP_DIRS = (".git", "venv", "node_modules")
+
+# Bump whenever the table layout changes; an index with another version is rebuilt.
+_SCHEMA_VERSION = 6
+_TOKEN_RE = re.compile(r"\w+")
+# Non-ASCII letters that re.IGNORECASE matches against an ASCII one; folded
+# before lower-casing so "İtem" and "ſun" index as "item" and "sun".
+_ASCII_FOLDS = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u212a': 'k', '\u017f': 's'})
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower-cased word tokens."""
+    # str.lower() turns a word-final capital sigma into final sigma (ς), but
+    # re.IGNORECASE treats ς and σ as the same letter, so fold it back
+    return _TOKEN_RE.findall(text.translate(_ASCII_FOLDS).lower().replace('\u03c2', '\u03c3'))
+
+
+def iter_repo_files(root: str) -> Iterator[str]:
+    """Yield the searchable files under root, in os.walk order."""
+    for dirpath, _, filenames in os.walk(root):
+        # skip virtualenv and .git directories
+        if any(part in SKIP_DIRS for part in dirpath.split(os.sep)):
+            continue
+        for fn in filenames:
+            if fn.endswith(SEARCH_EXTENSIONS):
+                yield os.path.join(dirpath, fn)
+
+
+class SearchIndex:
+    """Inverted index of token -> (file, line, count) postings stored in SQLite.
+
+    The index only narrows down candidate lines; callers confirm each
+    candidate against the file itself, so a query never returns a line
+    that does not contain it.
+    """
+
+    def __init__(self, root: str, path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.path = path or os.path.join(self.root, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._vocab: Optional[Dict[str, int]] = None
+        self._last_refresh = float("-inf")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != _SCHEMA_VERSION:
+            self.build()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def build(self) -> None:
+        """(Re)build the whole index from the files under root."""
+        with self._lock, self._conn:
+            conn = self._conn
+            conn.execute("DROP TABLE IF EXISTS postings")
+            conn.execute("DROP TABLE IF EXISTS tokens")
+            conn.execute("DROP TABLE IF EXISTS files")
+            conn.execute(
+                "CREATE TABLE files ("
+                " id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL,"
+                " mtime REAL NOT NULL, size INTEGER NOT NULL, hash TEXT NOT NULL,"
+                " ntokens INTEGER NOT NULL DEFAULT 0, walk_order INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE TABLE tokens (id INTEGER PRIMARY KEY, token TEXT UNIQUE NOT NULL)")
+            conn.execute(
+                "CREATE TABLE postings ("
+                " token_id INTEGER NOT NULL, file_id INTEGER NOT NULL, line INTEGER NOT NULL,"
+                " count INTEGER NOT NULL, PRIMARY KEY (token_id, file_id, line)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX postings_file ON postings (file_id)")
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._vocab = {}
+        self.refresh()
+
+    def refresh(self, min_interval: float = 0.0) -> Dict[str, int]:
+        """Bring the index up to date with the files under root.
+
+        Files whose mtime and size match the manifest are skipped without
+        being opened; files that did change are hashed and only re-tokenized
+        when their content really differs. Returns counts of added, changed
+        and removed files. With min_interval, a refresh that follows the
+        previous one within that many seconds does nothing.
+        """
+        counts = {"added": 0, "changed": 0, "removed": 0}
+        now = time.monotonic()
+        if min_interval and now - self._last_refresh < min_interval:
+            return counts
+        with self._lock:
+            try:
+                with self._conn:
+                    self._apply_changes(counts)
+            except Exception:
+                # token ids handed out inside the rolled-back transaction are gone
+                self._vocab = None
+                raise
+        self._last_refresh = time.monotonic()
+        return counts
+
+    def _apply_changes(self, counts: Dict[str, int]) -> None:
+        conn = self._conn
+        manifest = {
+            path: (file_id, mtime, size, digest, walk_order)
+            for file_id, path, mtime, size, digest, walk_order
+            in conn.execute("SELECT id, path, mtime, size, hash, walk_order FROM files")
+        }
+        # walk_order keeps unindexed-order results identical to a scan of the tree
+        for walk_order, path in enumerate(iter_repo_files(self.root)):
+            rel = os.path.relpath(path, start=self.root)
+            known = manifest.pop(rel, None)
+            if known is not None and known[4] != walk_order:
+                conn.execute("UPDATE files SET walk_order = ? WHERE id = ?", (walk_order, known[0]))
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if known is not None and known[1] == st.st_mtime and known[2] == st.st_size:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            digest = hashlib.sha1(data).hexdigest()
+            if known is None:
+                file_id = conn.execute(
+                    "INSERT INTO files (path, mtime, size, hash, walk_order) VALUES (?, ?, ?, ?, ?)",
+                    (rel, st.st_mtime, st.st_size, digest, walk_order),
+                ).lastrowid
+                counts["added"] += 1
+            else:
+                file_id = known[0]
+                conn.execute(
+                    "UPDATE files SET mtime = ?, size = ?, hash = ? WHERE id = ?",
+                    (st.st_mtime, st.st_size, digest, file_id),
+                )
+                if known[3] == digest:
+                    continue
+                conn.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+                counts["changed"] += 1
+            self._index_content(data, file_id)
+        # whatever is left in the manifest no longer exists on disk
+        for file_id, _, _, _, _ in manifest.values():
+            conn.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+            conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            counts["removed"] += 1
+
+    def _token_id(self, token: str) -> int:
+        if self._vocab is None:
+            self._vocab = dict(self._conn.execute("SELECT token, id FROM tokens"))
+        token_id = self._vocab.get(token)
+        if token_id is None:
+            token_id = self._conn.execute("INSERT INTO tokens (token) VALUES (?)", (token,)).lastrowid
+            self._vocab[token] = token_id
+        return token_id
+
+    def _index_content(self, data: bytes, file_id: int) -> None:
+        # Decode exactly like search() reads files so line numbers agree.
+        text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='ignore')
+        rows = []
+        ntokens = 0
+        for i, line in enumerate(text, start=1):
+            counts = Counter(tokenize(line))
+            ntokens += sum(counts.values())
+            for token, count in counts.items():
+                rows.append((self._token_id(token), file_id, i, count))
+        self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", rows)
+        self._conn.execute("UPDATE files SET ntokens = ? WHERE id = ?", (ntokens, file_id))
+
+    def _postings_for(self, word: str) -> Dict[Tuple[int, int], int]:
+        """Return {(file_id, line): occurrences} for every token containing word."""
+        # A query word can sit anywhere inside an indexed token (the query
+        # "comp" must find "list comprehension"), so match the vocabulary by
+        # substring and union the postings of every token that contains it.
+        token_ids = [row[0] for row in self._conn.execute(
+            "SELECT id FROM tokens WHERE instr(token, ?) > 0", (word,)
+        )]
+        postings: Dict[Tuple[int, int], int] = {}
+        for start in range(0, len(token_ids), 500):
+            chunk = token_ids[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            for file_id, line, count in self._conn.execute(
+                f"SELECT file_id, line, count FROM postings WHERE token_id IN ({marks})", chunk
+            ):
+                key = (file_id, line)
+                postings[key] = postings.get(key, 0) + count
+        return postings
+
+    def _word_postings(self, query: str) -> Optional[List[Dict[Tuple[int, int], int]]]:
+        words = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not words:
+            return None
+        return [self._postings_for(word) for word in words]
+
+    def candidates(self, query: str) -> Optional[List[Tuple[str, List[int]]]]:
+        """Return [(relative_path, [line_numbers])] that may contain query, files in
+        os.walk order (the order a full scan visits them).
+
+        Returns None when the query has no word characters and therefore
+        cannot be answered from the index.
+        """
+        with self._lock:
+            per_word = self._word_postings(query)
+            if per_word is None:
+                return None
+            lines = set.intersection(*(set(p) for p in per_word))
+            by_file: Dict[int, List[int]] = {}
+            for file_id, line in lines:
+                by_file.setdefault(file_id, []).append(line)
+            files = {file_id: (walk_order, path)
+                     for file_id, walk_order, path in self._conn.execute("SELECT id, walk_order, path FROM files")}
+        return [(files[file_id][1], sorted(by_file[file_id]))
+                for file_id in sorted(by_file, key=lambda file_id: files[file_id])]
+
+    def _confirm(self, rel: str, line_numbers: List[int], pattern: "re.Pattern[str]") -> Iterator[Tuple[int, str]]:
+        """Yield (line_number, line_text) for the candidate lines that really match."""
+        wanted = set(line_numbers)
+        last = max(line_numbers)
+        try:
+            with open(os.path.join(self.root, rel), 'r', encoding='utf-8', errors='ignore') as f:
+                for i, line in enumerate(f, start=1):
+                    if i in wanted and pattern.search(line):
+                        yield i, line.strip()
+                    if i >= last:
+                        break
+        except OSError:
+            return
+
+    def iter_search(self, query: str, ranked: bool = False, max_results: int = 20) -> Iterator[Tuple[str, int, str]]:
+        """Return an iterator over confirmed matches.
+
+        The index lookup happens before this returns (so ValueError for an
+        unindexable query is raised here); files are then opened lazily as
+        the iterator is consumed. Ranked results are computed up front.
+        """
+        if ranked:
+            return (match for match in self.ranked_search(query, max_results))
+        candidates = self.candidates(query)
+        if candidates is None:
+            raise ValueError("query has no indexable tokens")
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        return (
+            (rel, i, text)
+            for rel, line_numbers in candidates
+            for i, text in self._confirm(rel, line_numbers, pattern)
+        )
+
+    def search(self, query: str, max_results: int = 20, ranked: bool = False) -> List[Tuple[str, int, str]]:
+        """Search the index, confirming every candidate line against the file on disk.
+        With ranked=True results come back in BM25 relevance order instead of file order.
+        """
+        return list(itertools.islice(self.iter_search(query, ranked=ranked, max_results=max_results), max_results))
+
+    def ranked_search(self, query: str, max_results: int = 20, k1: float = 1.2,
+                      b: float = 0.75) -> List[Tuple[str, int, str]]:
+        """Return the max_results best matching lines, most relevant first.
+
+        Each file is scored with BM25 over the query words (a file is the
+        document); each line adds a BM25-style bonus for how often the words
+        occur in it. Files are visited best-first and only the current top
+        max_results lines are kept in a heap; visiting stops as soon as no
+        remaining file could beat the weakest kept line.
+        """
+        with self._lock:
+            per_word = self._word_postings(query)
+            if per_word is None:
+                raise ValueError("query has no indexable tokens")
+            n_files, avg_len = self._conn.execute("SELECT COUNT(*), AVG(ntokens) FROM files").fetchone()
+            lengths = dict(self._conn.execute("SELECT id, ntokens FROM files"))
+            paths = dict(self._conn.execute("SELECT id, path FROM files"))
+        lines = set.intersection(*(set(p) for p in per_word))
+        if not lines:
+            return []
+        avg_len = avg_len or 1.0
+
+        idfs = []
+        file_scores: Dict[int, float] = {}
+        for postings in per_word:
+            tf: Dict[int, int] = {}
+            for (file_id, _), count in postings.items():
+                tf[file_id] = tf.get(file_id, 0) + count
+            idf = math.log(1 + (n_files - len(tf) + 0.5) / (len(tf) + 0.5))
+            idfs.append(idf)
+            for file_id, freq in tf.items():
+                norm = k1 * (1 - b + b * lengths.get(file_id, 0) / avg_len)
+                file_scores[file_id] = file_scores.get(file_id, 0.0) + idf * freq * (k1 + 1) / (freq + norm)
+        max_line_bonus = sum(idf * (k1 + 1) for idf in idfs)
+
+        by_file: Dict[int, List[int]] = {}
+        for file_id, line in lines:
+            by_file.setdefault(file_id, []).append(line)
+
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        # min-heap of (score, -visit_order, result): the root is the weakest kept line
+        heap: List[Tuple[float, int, Tuple[str, int, str]]] = []
+        order = 0
+        for file_id in sorted(by_file, key=lambda f: (-file_scores.get(f, 0.0), f)):
+            file_score = file_scores.get(file_id, 0.0)
+            if len(heap) >= max_results and file_score + max_line_bonus <= heap[0][0]:
+                break
+            rel = paths[file_id]
+            for i, text in self._confirm(rel, by_file[file_id], pattern):
+                line_bonus = 0.0
+                for idf, postings in zip(idfs, per_word):
+                    count = postings.get((file_id, i), 0)
+                    line_bonus += idf * count * (k1 + 1) / (count + k1)
+                entry = (file_score + line_bonus, -order, (rel, i, text))
+                order += 1
+                if len(heap) < max_results:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+        return [result for _, _, result in sorted(heap, reverse=True)]
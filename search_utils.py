@@ -1,56 +1,262 @@
+import asyncio
+import codecs
+import itertools
+import mmap
 import os
 import re
-import requests
-from typing import List, Tuple
+import sqlite3
+import threading
+from collections import deque
+from contextlib import closing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-def search_repo(query: str, root: str = ".", max_results: int = 20) -> List[Tuple[str, int, str]]:
-    """Search repository files for lines containing the query (case-insensitive).
-    Returns list of tuples: (relative_path, line_number, line_text).
+from search_index import SearchIndex, iter_repo_files
+from wiki_client import WikiResult, get_wiki_client
+from wiki_offline import get_offline_wiki
+
+_BARE_CR = re.compile(rb"\r(?!\n)")
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+# refresh() called on every rerun does nothing if the index was refreshed this recently
+INDEX_REFRESH_INTERVAL = 2.0
+
+_indexes: Dict[str, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_index(root: str = ".") -> SearchIndex:
+    """Return the on-disk search index for root, building it on first use.
+    An index left on disk by an earlier process is brought up to date once when loaded.
+    """
+    key = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = SearchIndex(key)
+            index.refresh()
+            _indexes[key] = index
+        return index
+
+def refresh(root: str = ".", min_interval: float = INDEX_REFRESH_INTERVAL) -> Dict[str, int]:
+    """Re-index only the files under root that were added, changed or deleted.
+    Cheap enough to call on every Streamlit rerun; calls closer together than
+    min_interval seconds are skipped. Returns counts of added/changed/removed files.
     """
-    results = []
+    return get_index(root).refresh(min_interval=min_interval)
+
+# Non-ASCII characters that re.IGNORECASE treats as equal to an ASCII letter.
+_NON_ASCII_FOLDS = {'i': '\u0130\u0131', 'k': '\u212a', 's': '\u017f'}
+
+def _literal_bytes_pattern(query: str) -> Optional["re.Pattern[bytes]"]:
+    """Compile a bytes pattern matching UTF-8 text exactly where the
+    case-insensitive str pattern for query would, or None if the query
+    does not qualify for the byte-level fast path."""
+    if not query or not query.isascii() or '\n' in query or '\r' in query:
+        return None
+    parts = []
+    for ch in query:
+        if ch.isalpha():
+            options = [ch.lower(), ch.upper()] + list(_NON_ASCII_FOLDS.get(ch.lower(), ''))
+            parts.append(b"(?:" + b"|".join(re.escape(o.encode('utf-8')) for o in options) + b")")
+        else:
+            parts.append(re.escape(ch.encode('ascii')))
+    return re.compile(b"".join(parts))
+
+def _is_utf8(mm: mmap.mmap, chunk_size: int = 1 << 16) -> bool:
+    """Whether the mapped file is valid UTF-8, checked chunk_size bytes at a
+    time so memory use stays bounded; the decoded text is thrown away."""
+    decoder = codecs.getincrementaldecoder('utf-8')('strict')
+    try:
+        for start in range(0, len(mm), chunk_size):
+            decoder.decode(mm[start:start + chunk_size])
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def _mmap_scan(path: str, pattern: "re.Pattern[bytes]", limit: int) -> Optional[List[Tuple[int, str]]]:
+    """Return up to limit (line_number, line_text) matches by searching the raw bytes.
+
+    Only the matched lines are decoded. Returns None for files where text
+    mode could give a different answer, so the caller can fall back to
+    decoding the file: a bare carriage return counts as a line break there,
+    and invalid UTF-8 bytes are dropped there, which can join the two halves
+    of a match (b"a\\xffb" matches "ab").
+    """
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return []
+    with mm:
+        if _NON_ASCII.search(mm) and not _is_utf8(mm):
+            return None
+        m = pattern.search(mm)
+        if m is None:
+            return []
+        if _BARE_CR.search(mm):
+            return None
+        matches = []
+        line_no, counted_to = 1, 0
+        while m is not None and len(matches) < limit:
+            start = mm.rfind(b'\n', 0, m.start()) + 1
+            end = mm.find(b'\n', m.end())
+            if end < 0:
+                end = len(mm)
+            line_no += mm[counted_to:start].count(b'\n')
+            counted_to = start
+            matches.append((line_no, mm[start:end].decode('utf-8', errors='ignore').strip()))
+            m = pattern.search(mm, end + 1)
+        return matches
+
+def _iter_scan_paths(paths: Iterable[str], query: str, root: str, limit: int) -> Iterator[Tuple[str, int, str]]:
+    """Scan the given files in order, yielding at most limit matches."""
+    found = 0
     pattern = re.compile(re.escape(query), re.IGNORECASE)
-    for dirpath, _, filenames in os.walk(root):
-        # skip virtualenv and .git directories
-        if any(part in (".git", "venv", "node_modules") for part in dirpath.split(os.sep)):
-            continue
-        for fn in filenames:
-            if fn.endswith(('.py', '.md', '.txt', '.rst')):
-                path = os.path.join(dirpath, fn)
-                try:
-                    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                        for i, line in enumerate(f, start=1):
-                            if pattern.search(line):
-                                rel = os.path.relpath(path, start=root)
-                                results.append((rel, i, line.strip()))
-                                if len(results) >= max_results:
-                                    return results
-                except Exception:
+    fast_pattern = _literal_bytes_pattern(query)
+    for path in paths:
+        rel = os.path.relpath(path, start=root)
+        try:
+            if fast_pattern is not None:
+                matches = _mmap_scan(path, fast_pattern, limit - found)
+                if matches is not None:
+                    for i, text in matches:
+                        yield rel, i, text
+                    found += len(matches)
+                    if found >= limit:
+                        return
                     continue
-    return results
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                for i, line in enumerate(f, start=1):
+                    if pattern.search(line):
+                        yield rel, i, line.strip()
+                        found += 1
+                        if found >= limit:
+                            return
+        except Exception:
+            continue
+
+def _scan_paths(paths: List[str], query: str, root: str, max_results: int) -> List[Tuple[str, int, str]]:
+    """Process-pool worker: scan one chunk of files, stopping after max_results matches."""
+    return list(_iter_scan_paths(paths, query, root, max_results))
+
+def _chunks(paths: Iterator[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_scan_repo(query: str, root: str = ".", max_results: int = 20, workers: int = 1,
+                   chunk_size: int = 256, cancel: Optional[threading.Event] = None) -> Iterator[Tuple[str, int, str]]:
+    """Yield matches by reading every file under root, without using the index.
+
+    With workers > 1 the files are split into chunks of chunk_size and scanned
+    in a process pool. Chunks are collected in submission order, so results
+    come back in the same order as a serial scan, and once max_results
+    matches are in hand (or cancel is set, or the generator is closed) the
+    outstanding chunks are cancelled.
+    """
+    if workers <= 1:
+        paths = iter_repo_files(root)
+        if cancel is not None:
+            paths = itertools.takewhile(lambda _: not cancel.is_set(), paths)
+        yield from _iter_scan_paths(paths, query, root, max_results)
+        return
+    found = 0
+    chunks = _chunks(iter_repo_files(root), chunk_size)
+    pending: Deque[Future] = deque()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # keep a bounded window of chunks in flight instead of queueing the whole tree
+        for chunk in itertools.islice(chunks, workers * 2):
+            pending.append(executor.submit(_scan_paths, chunk, query, root, max_results))
+        while pending:
+            if cancel is not None and cancel.is_set():
+                return
+            for match in pending.popleft().result():
+                yield match
+                found += 1
+                if found >= max_results:
+                    return
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(executor.submit(_scan_paths, chunk, query, root, max_results))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def scan_repo(query: str, root: str = ".", max_results: int = 20, workers: int = 1,
+              chunk_size: int = 256) -> List[Tuple[str, int, str]]:
+    """Search by reading every file under root, without using the index. See iter_scan_repo."""
+    return list(iter_scan_repo(query, root=root, max_results=max_results, workers=workers, chunk_size=chunk_size))
+
+def iter_search_repo(query: str, root: str = ".", max_results: int = 20, use_index: bool = True,
+                     workers: int = 1, ranked: bool = False,
+                     cancel: Optional[threading.Event] = None) -> Iterator[Tuple[str, int, str]]:
+    """Yield (relative_path, line_number, line_text) matches as soon as they are found.
+
+    Takes the same options as search_repo. Iteration stops early when cancel
+    is set; closing the generator also stops any worker processes. Ranked
+    results can only be ordered once all candidates are scored, so they
+    arrive together. The index is refreshed first, unthrottled, so files
+    added or edited right before the search are found, as with a full scan.
+    """
+    matches: Optional[Iterator[Tuple[str, int, str]]] = None
+    if use_index:
+        try:
+            index = get_index(root)
+            index.refresh()
+            matches = index.iter_search(query, ranked=ranked, max_results=max_results)
+        except (ValueError, OSError, sqlite3.Error):
+            matches = None
+    if matches is None:
+        matches = iter_scan_repo(query, root=root, max_results=max_results, workers=workers, cancel=cancel)
+    with closing(matches):
+        for match in itertools.islice(matches, max_results):
+            if cancel is not None and cancel.is_set():
+                return
+            yield match
+
+def search_repo(query: str, root: str = ".", max_results: int = 20, use_index: bool = True,
+                workers: int = 1, ranked: bool = False) -> List[Tuple[str, int, str]]:
+    """Search repository files for lines containing the query (case-insensitive).
+    Returns list of tuples: (relative_path, line_number, line_text).
+
+    Queries are answered from the on-disk index when possible; queries without
+    word characters, or an index that cannot be created, fall back to a full scan,
+    which runs in a process pool when workers > 1.
+    With ranked=True indexed results are ordered by BM25 relevance instead of file order.
+    """
+    return list(iter_search_repo(query, root=root, max_results=max_results, use_index=use_index,
+                                 workers=workers, ranked=ranked))
+
+def _wiki_backend():
+    """The offline Wikipedia index when one has been built, else the online client."""
+    return get_offline_wiki() or get_wiki_client()
 
 def wiki_search_summary(query: str) -> Tuple[str, str]:
-    """Return (title, summary) from Wikipedia for the query. If none found, return ("", "")."""
-    search_url = "https://en.wikipedia.org/w/api.php"
-    params = {
-        'action': 'query',
-        'list': 'search',
-        'srsearch': query,
-        'format': 'json',
-        'srlimit': 1,
-    }
+    """Return (title, summary) from Wikipedia for the query. If none found, return ("", "").
+    Answers from the offline index when available, otherwise uses the shared,
+    cached WikiClient so repeated queries avoid the network.
+    """
     try:
-        r = requests.get(search_url, params=params, timeout=6)
-        r.raise_for_status()
-        data = r.json()
-        hits = data.get('query', {}).get('search', [])
-        if not hits:
-            return "", ""
-        title = hits[0]['title']
-        # fetch summary
-        summary_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{requests.utils.requote_uri(title)}"
-        s = requests.get(summary_url, timeout=6)
-        s.raise_for_status()
-        summ = s.json().get('extract', '')
-        return title, summ
+        return _wiki_backend().search_summary(query)
     except Exception:
         return "", ""
+
+def wiki_lookup(query: str) -> WikiResult:
+    """Return a WikiResult for the query; its status tells a Wikipedia miss
+    ("miss") apart from a failed request ("error")."""
+    return _wiki_backend().lookup(query)
+
+def wiki_search_summaries(queries: Sequence[str], concurrency: int = 8) -> List[Tuple[str, str]]:
+    """Look up many queries concurrently (e.g. to pre-warm the cache).
+    Returns one (title, summary) per query, in input order; ("", "") for misses and failures.
+    """
+    offline = get_offline_wiki()
+    if offline is not None:
+        return [offline.search_summary(query) for query in queries]
+    return asyncio.run(get_wiki_client().search_summaries_async(queries, concurrency=concurrency))
@@ -0,0 +1,126 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional, Tuple
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    Entries live in memory (at most maxsize, least recently used evicted
+    first). When path is given they are also written to a SQLite table so a
+    restarted process starts warm; values must then be JSON-serializable.
+    Expired entries are kept for a further stale_ttl seconds, during which
+    get_entry() still returns them so callers can serve stale data while
+    they refresh it.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, path: Optional[str] = None,
+                 table: str = "cache", disk_maxsize: int = 100_000, stale_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.disk_maxsize = disk_maxsize
+        self._table = table
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                    " stored_at REAL NOT NULL, expires_at REAL NOT NULL)"
+                )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default if it is missing or expired."""
+        entry = self.get_entry(key)
+        if entry is None or not entry.fresh:
+            return default
+        return entry.value
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for key, including one that has expired but is
+        still within its stale window, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._conn is not None:
+                row = self._conn.execute(
+                    f"SELECT value, expires_at FROM {self._table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1])
+                    self._remember(key, entry)
+            if entry is None:
+                return None
+            if entry[1] + self.stale_ttl <= now:
+                self._forget(key)
+                return None
+            self._memory.move_to_end(key)
+            return CacheEntry(*entry)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key for ttl seconds (the cache default if None)."""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, (value, expires_at))
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        f"INSERT OR REPLACE INTO {self._table} VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(value), now, expires_at),
+                    )
+                    self._writes += 1
+                    if self._writes % 100 == 0:
+                        self._prune_disk(now)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._forget(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(f"DELETE FROM {self._table}")
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _remember(self, key: str, entry: Tuple[Any, float]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key: str) -> None:
+        self._memory.pop(key, None)
+        if self._conn is not None:
+            with self._conn:
+                self._conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+
+    def _prune_disk(self, now: float) -> None:
+        # drop rows past their stale window, then the oldest rows beyond disk_maxsize
+        self._conn.execute(f"DELETE FROM {self._table} WHERE expires_at <= ?", (now - self.stale_ttl,))
+        self._conn.execute(
+            f"DELETE FROM {self._table} WHERE key IN ("
+            f" SELECT key FROM {self._table} ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_maxsize,),
+        )
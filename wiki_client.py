@@ -0,0 +1,199 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ttl_cache import TTLCache
+
+WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
+WIKI_REST_URL = "https://en.wikipedia.org/api/rest_v1"
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".wiki_cache.sqlite3")
+
+
+def _query_key(query: str) -> str:
+    """Normalize a query so that case and spacing variants share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+class WikiResult(NamedTuple):
+    title: str
+    summary: str
+    status: str  # "hit", "miss" (Wikipedia has no match) or "error" (request failed)
+
+
+class WikiClient:
+    """Wikipedia search + summary client with connection reuse and caching.
+
+    All requests go through one requests.Session whose pooled, keep-alive
+    connections are reused between queries. Query -> title and
+    title -> summary lookups are kept in TTL + LRU caches that are persisted
+    to SQLite (cache_path=None keeps them in memory only).
+
+    Misses are cached too, for the shorter negative_ttl. Entries that have
+    expired but are less than stale_ttl past expiry are served immediately
+    while a background thread fetches a fresh copy. Failed requests are
+    never cached, so a transient failure is retried on the next lookup.
+    """
+
+    def __init__(self, cache_path: Optional[str] = DEFAULT_CACHE_PATH, ttl: float = 24 * 3600,
+                 maxsize: int = 1024, timeout: float = 6, pool_size: int = 10,
+                 api_url: str = WIKI_API_URL, rest_url: str = WIKI_REST_URL,
+                 negative_ttl: float = 10 * 60, stale_ttl: float = 7 * 24 * 3600):
+        self.api_url = api_url
+        self.rest_url = rest_url.rstrip("/")
+        self.timeout = timeout
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "cuhk-ai-course-info-finder/1.0"
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.titles = TTLCache(maxsize=maxsize, ttl=ttl, path=cache_path, table="wiki_titles",
+                               stale_ttl=stale_ttl)
+        self.summaries = TTLCache(maxsize=maxsize, ttl=ttl, path=cache_path, table="wiki_summaries",
+                                  stale_ttl=stale_ttl)
+        self._revalidating: Set[Tuple[int, str]] = set()
+        self._revalidating_lock = threading.Lock()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _cached(self, cache: TTLCache, key: str, fetch: Callable[[], str]) -> str:
+        entry = cache.get_entry(key)
+        if entry is not None:
+            if not entry.fresh:
+                self._revalidate(cache, key, fetch)
+            return entry.value
+        return self._store(cache, key, fetch())
+
+    def _store(self, cache: TTLCache, key: str, value: str) -> str:
+        cache.set(key, value, ttl=self.ttl if value else self.negative_ttl)
+        return value
+
+    def _revalidate(self, cache: TTLCache, key: str, fetch: Callable[[], str]) -> None:
+        """Refresh a stale entry in a background thread, at most once at a time per key."""
+        job = (id(cache), key)
+        with self._revalidating_lock:
+            if job in self._revalidating:
+                return
+            self._revalidating.add(job)
+
+        def run():
+            try:
+                self._store(cache, key, fetch())
+            except Exception:
+                pass  # keep serving the stale value; the next lookup tries again
+            finally:
+                with self._revalidating_lock:
+                    self._revalidating.discard(job)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _fetch_title(self, query: str) -> str:
+        params = {
+            'action': 'query',
+            'list': 'search',
+            'srsearch': query,
+            'format': 'json',
+            'srlimit': 1,
+        }
+        r = self.session.get(self.api_url, params=params, timeout=self.timeout)
+        r.raise_for_status()
+        hits = r.json().get('query', {}).get('search', [])
+        return hits[0]['title'] if hits else ""
+
+    def _fetch_summary(self, title: str) -> str:
+        summary_url = f"{self.rest_url}/page/summary/{requests.utils.requote_uri(title)}"
+        s = self.session.get(summary_url, timeout=self.timeout)
+        s.raise_for_status()
+        return s.json().get('extract', '')
+
+    def search_title(self, query: str) -> str:
+        """Return the title of the best search hit for query, or "" if there is none."""
+        return self._cached(self.titles, _query_key(query), lambda: self._fetch_title(query))
+
+    def summary(self, title: str) -> str:
+        """Return the lead-section summary of the page called title."""
+        return self._cached(self.summaries, title, lambda: self._fetch_summary(title))
+
+    def search_summary(self, query: str) -> Tuple[str, str]:
+        """Return (title, summary) for query, or ("", "") when nothing matches.
+        Network and HTTP errors are raised to the caller.
+        """
+        title = self.search_title(query)
+        if not title:
+            return "", ""
+        return title, self.summary(title)
+
+    def lookup(self, query: str) -> WikiResult:
+        """Like search_summary, but reports failures as status "error" instead of raising."""
+        try:
+            title, summ = self.search_summary(query)
+        except (requests.RequestException, ValueError, KeyError):
+            return WikiResult("", "", "error")
+        return WikiResult(title, summ, "hit" if title else "miss")
+
+    async def search_summaries_async(self, queries: Sequence[str], concurrency: int = 8) -> List[Tuple[str, str]]:
+        """Resolve many queries at once, returning (title, summary) pairs in input order.
+
+        Each query runs its search and summary requests back to back, with at
+        most concurrency requests in flight overall. Repeated queries, and
+        different queries that land on the same title, share one request. A
+        query that fails returns ("", "") without affecting the others.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        summary_tasks: Dict[str, "asyncio.Future[str]"] = {}
+        # asyncio.to_thread would use the loop's default executor, which is
+        # capped at min(32, cpus + 4) threads and would throttle concurrency
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="wiki-batch")
+        loop = asyncio.get_running_loop()
+
+        async def call(func, arg):
+            async with semaphore:
+                return await loop.run_in_executor(executor, func, arg)
+
+        async def resolve(query: str) -> Tuple[str, str]:
+            try:
+                title = await call(self.search_title, query)
+                if not title:
+                    return "", ""
+                task = summary_tasks.get(title)
+                if task is None:
+                    task = summary_tasks[title] = asyncio.ensure_future(call(self.summary, title))
+                return title, await task
+            except Exception:
+                return "", ""
+
+        query_tasks: Dict[str, "asyncio.Future[Tuple[str, str]]"] = {}
+        try:
+            for query in queries:
+                key = _query_key(query)
+                if key not in query_tasks:
+                    query_tasks[key] = asyncio.ensure_future(resolve(query))
+            resolved = dict(zip(query_tasks, await asyncio.gather(*query_tasks.values())))
+        finally:
+            executor.shutdown(wait=False)
+        return [resolved[_query_key(query)] for query in queries]
+
+
+_default_client: Optional[WikiClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_wiki_client() -> WikiClient:
+    """Return the process-wide WikiClient, creating it on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            try:
+                _default_client = WikiClient()
+            except sqlite3.Error:
+                # e.g. a read-only checkout: fall back to an in-memory cache
+                _default_client = WikiClient(cache_path=None)
+        return _default_client
@@ -0,0 +1,202 @@
+"""
+Offline Wikipedia backend built from a Wikipedia abstracts dump.
+
+Build the index once (the dump is enwiki-latest-abstract.xml.gz from
+https://dumps.wikimedia.org/enwiki/latest/):
+
+    python wiki_offline.py enwiki-latest-abstract.xml.gz [index_dir]
+
+Info Finder then answers Wikipedia queries from index_dir (by default
+.wiki_offline next to this file, or $WIKI_OFFLINE_INDEX) without any network
+access. The index directory holds:
+
+    summaries.bin   zlib-compressed "title\0summary" records, back to back
+    offsets.bin     uint64 start offset of every record (plus the end offset)
+    index.sqlite3   exact-title table and an FTS5 full-text index over the records
+
+Both .bin files are memory-mapped, so a lookup decompresses only the record
+it returns.
+"""
+
+import bz2
+import gzip
+import mmap
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+import zlib
+from array import array
+from typing import Iterator, Optional, Tuple
+
+from wiki_client import WikiResult
+
+DEFAULT_INDEX_DIR = os.environ.get(
+    "WIKI_OFFLINE_INDEX",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".wiki_offline"),
+)
+_TITLE_PREFIX = "Wikipedia: "
+_WORD_RE = re.compile(r"\w+")
+
+
+def _title_key(title: str) -> str:
+    return " ".join(title.lower().split())
+
+
+def iter_abstracts(dump_path: str) -> Iterator[Tuple[str, str]]:
+    """Yield (title, abstract) pairs from an abstracts dump, streaming it."""
+    opener = gzip.open if dump_path.endswith(".gz") else bz2.open if dump_path.endswith(".bz2") else open
+    with opener(dump_path, "rb") as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag != "doc":
+                continue
+            title = (elem.findtext("title") or "").strip()
+            if title.startswith(_TITLE_PREFIX):
+                title = title[len(_TITLE_PREFIX):]
+            abstract = (elem.findtext("abstract") or "").strip()
+            elem.clear()
+            if title:
+                yield title, abstract
+
+
+def _write_index(dump_path: str, index_dir: str) -> int:
+    db_path = os.path.join(index_dir, "index.sqlite3")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE titles (key TEXT PRIMARY KEY, id INTEGER NOT NULL) WITHOUT ROWID")
+    conn.execute("CREATE VIRTUAL TABLE docs USING fts5(title, summary, content='')")
+    offsets = array("Q", [0])
+    count = 0
+    with open(os.path.join(index_dir, "summaries.bin"), "wb") as store, conn:
+        titles, docs = [], []
+        for title, abstract in iter_abstracts(dump_path):
+            record = zlib.compress(f"{title}\0{abstract}".encode("utf-8"))
+            store.write(record)
+            offsets.append(offsets[-1] + len(record))
+            titles.append((_title_key(title), count))
+            docs.append((count, title, abstract))
+            count += 1
+            if len(docs) >= 10_000:
+                conn.executemany("INSERT OR IGNORE INTO titles VALUES (?, ?)", titles)
+                conn.executemany("INSERT INTO docs (rowid, title, summary) VALUES (?, ?, ?)", docs)
+                titles, docs = [], []
+        conn.executemany("INSERT OR IGNORE INTO titles VALUES (?, ?)", titles)
+        conn.executemany("INSERT INTO docs (rowid, title, summary) VALUES (?, ?, ?)", docs)
+        conn.execute("INSERT INTO docs (docs) VALUES ('optimize')")
+    conn.close()
+    # offsets.bin is written last and marks a complete index
+    with open(os.path.join(index_dir, "offsets.bin"), "wb") as f:
+        offsets.tofile(f)
+    return count
+
+
+def build_offline_index(dump_path: str, index_dir: str = DEFAULT_INDEX_DIR) -> int:
+    """Build the offline store and full-text index from dump_path. Returns the number of pages.
+
+    The index is written to a new directory next to index_dir and swapped in
+    once complete. The files of an existing index are never truncated, so a
+    running Info Finder that has them memory-mapped keeps reading the old
+    index until it restarts.
+    """
+    index_dir = os.path.abspath(index_dir)
+    parent = os.path.dirname(index_dir)
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(dir=parent, prefix=os.path.basename(index_dir) + ".build-")
+    old_dir = build_dir + ".old"
+    try:
+        os.chmod(build_dir, 0o755)  # mkdtemp makes it private to this user
+        count = _write_index(dump_path, build_dir)
+        if os.path.exists(index_dir):
+            os.replace(index_dir, old_dir)
+        os.replace(build_dir, index_dir)
+    except BaseException:
+        if os.path.exists(old_dir) and not os.path.exists(index_dir):
+            os.replace(old_dir, index_dir)
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    shutil.rmtree(old_dir, ignore_errors=True)  # open mappings keep their files alive
+    return count
+
+
+class OfflineWiki:
+    """Answers Wikipedia lookups from an index made by build_offline_index."""
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR):
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            f"file:{os.path.join(index_dir, 'index.sqlite3')}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA mmap_size = 1073741824")
+        with open(os.path.join(index_dir, "summaries.bin"), "rb") as f:
+            self._store = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(os.path.join(index_dir, "offsets.bin"), "rb") as f:
+            self._offsets_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = memoryview(self._offsets_map).cast("Q")
+
+    def close(self) -> None:
+        self._offsets.release()
+        self._offsets_map.close()
+        self._store.close()
+        self._conn.close()
+
+    def _record(self, doc_id: int) -> Tuple[str, str]:
+        start, end = self._offsets[doc_id], self._offsets[doc_id + 1]
+        title, _, summary = zlib.decompress(self._store[start:end]).decode("utf-8").partition("\0")
+        return title, summary
+
+    def _find(self, query: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM titles WHERE key = ?", (_title_key(query),)).fetchone()
+            if row is not None:
+                return row[0]
+            words = _WORD_RE.findall(query)
+            if not words:
+                return None
+            # Narrowest first: all words in the title, all words anywhere, any
+            # word in the title. Fewer candidate rows keeps bm25 ranking fast.
+            phrases = [f'"{w}"' for w in words]
+            for match in ("title: (" + " ".join(phrases) + ")",
+                          " ".join(phrases),
+                          "title: (" + " OR ".join(phrases) + ")"):
+                row = self._conn.execute(
+                    "SELECT rowid FROM docs WHERE docs MATCH ? ORDER BY bm25(docs, 10.0, 1.0) LIMIT 1",
+                    (match,),
+                ).fetchone()
+                if row is not None:
+                    return row[0]
+        return None
+
+    def search_summary(self, query: str) -> Tuple[str, str]:
+        """Return (title, summary) for query, or ("", "") when nothing matches."""
+        doc_id = self._find(query)
+        if doc_id is None:
+            return "", ""
+        return self._record(doc_id)
+
+    def lookup(self, query: str) -> WikiResult:
+        title, summary = self.search_summary(query)
+        return WikiResult(title, summary, "hit" if title else "miss")
+
+
+_offline: Optional[OfflineWiki] = None
+_offline_lock = threading.Lock()
+
+
+def get_offline_wiki(index_dir: str = DEFAULT_INDEX_DIR) -> Optional[OfflineWiki]:
+    """Return the shared OfflineWiki, or None when no offline index has been built."""
+    global _offline
+    with _offline_lock:
+        if _offline is None and os.path.exists(os.path.join(index_dir, "offsets.bin")):
+            _offline = OfflineWiki(index_dir)
+        return _offline
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_INDEX_DIR
+    print(f"Indexed {build_offline_index(sys.argv[1], out_dir)} pages into {out_dir}")